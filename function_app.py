@@ -19,20 +19,64 @@ import logging
 import json
 import os
 import re
-from datetime import datetime, timedelta, date
+import time
+import threading
+import posixpath
+import zipfile
+from bisect import bisect_right
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, date
+from functools import lru_cache
 from io import BytesIO
+import tempfile
+from tempfile import SpooledTemporaryFile
+from urllib.parse import quote
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback keeps the app working without it
+    orjson = None
 from openpyxl import load_workbook
-from openpyxl.styles import PatternFill, Font, Border, Side
-from openpyxl.formatting.rule import CellIsRule, FormulaRule
-from openpyxl.utils import get_column_letter
+from openpyxl.cell.text import Text
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
 
 # Initialize the Function App
 app = func.FunctionApp()
 
-# Cache for resolved file IDs
+# Shared HTTP session - keeps connections to Graph/AAD alive between calls and
+# retries throttled or transient failures (honouring Retry-After)
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=Retry(
+    total=5,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    respect_retry_after_header=True,
+    raise_on_status=False
+)))
+
+# (connect, read) timeout in seconds for every AAD / Graph call
+HTTP_TIMEOUT = (5, 60)
+
+# Access token reused until TOKEN_REFRESH_MARGIN seconds before it expires
+_token_cache = {'token': None, 'expires': 0.0}
+_token_lock = threading.Lock()
+TOKEN_REFRESH_MARGIN = 300
+
+# Cache for resolved file IDs (mirrored to FILE_ID_CACHE_PATH so it survives cold starts).
+# {file_path: (file_id, time.monotonic() deadline)} - each entry expires on its own
 _file_id_cache = {}
-_cache_expiry = None
+_file_id_cache_lock = threading.Lock()
+_file_id_cache_saved_at = 0.0
+
+# Parsed config, reused while the config file's ETag is unchanged
+_config_cache = {'etag': None, 'value': None}
 
 # =============================================================================
 # CONFIGURATION
@@ -45,6 +89,37 @@ SHAREPOINT_SITE_ID = os.environ.get(
 )
 DRIVE_ID = os.environ.get('DRIVE_ID', '')
 
+# Microsoft Graph accepts at most 20 sub-requests per $batch call
+GRAPH_BATCH_LIMIT = 20
+
+# Downloads are streamed in chunks; files above the spool size go to a temp file
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Saved workbooks are buffered in memory up to this size, then on disk until uploaded
+SAVE_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Seconds to wait at the end of a run for a background notification email
+EMAIL_FLUSH_TIMEOUT = 60
+
+# Resolved file IDs are persisted here between instances; writes from single
+# lookups are batched to at most one every FILE_ID_CACHE_SAVE_INTERVAL seconds
+FILE_ID_CACHE_PATH = os.environ.get(
+    'FILE_ID_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'kpi_file_id_cache.json')
+)
+FILE_ID_CACHE_SAVE_INTERVAL = 30
+FILE_ID_CACHE_TTL = 24 * 60 * 60
+FILE_ID_CACHE_MAX_ENTRIES = 1024
+
+# Uploads above the threshold use a Graph upload session; chunk size must be a
+# multiple of 320 KiB
+UPLOAD_SESSION_THRESHOLD = 4 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 10 * 320 * 1024
+
+# Concurrent individual sheet updates (kept low to stay under Graph throttling;
+# override with the INDIVIDUAL_MAX_WORKERS app setting)
+INDIVIDUAL_MAX_WORKERS = max(1, int(os.environ.get('INDIVIDUAL_MAX_WORKERS', '8')))
+
 # File paths in SharePoint
 CONFIG_FILE_PATH = '/Excel files/KPI Files/KPI/config/KPI_Config_Tables_v4.xlsx'
 TEAM_LEADER_FILE_PATH = '/Excel files/KPI Files/KPI/Team_Leader_2026.xlsx'
@@ -76,7 +151,11 @@ DEFAULT_COLORS = {
 }
 
 # Month columns for Jan-Dec structure
-MONTH_COLUMNS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'June', 'July', 'Aug', 'Sept', 'Oct', 'Nov', 'Dec']
+MONTH_COLUMNS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'June', 'July', 'Aug', 'Sept', 'Oct', 'Nov', 'Dec')
+MONTH_SET = frozenset(MONTH_COLUMNS)
+
+# Four-digit year in file names like 'Team_Leader_2026.xlsx'
+YEAR_PATTERN = re.compile(r'(\d{4})')
 
 # Month name to number mapping
 MONTH_NAME_TO_NUM = {
@@ -130,7 +209,11 @@ SHEET_CONFIG = {
 # =============================================================================
 
 def get_access_token():
-    """Get access token using app registration (client credentials)."""
+    """Get access token using app registration (client credentials), cached until near expiry."""
+    with _token_lock:
+        if _token_cache['token'] and time.monotonic() < _token_cache['expires']:
+            return _token_cache['token']
+    
     # Use app registration credentials (not Managed Identity)
     # Managed Identity is only used for Key Vault access, not Graph API
     tenant_id = os.environ.get('TENANT_ID') or os.environ.get('AZURE_TENANT_ID')
@@ -148,53 +231,145 @@ def get_access_token():
         'client_secret': client_secret,
         'scope': 'https://graph.microsoft.com/.default'
     }
-    response = requests.post(token_url, data=data)
+    response = _session.post(token_url, data=data, timeout=HTTP_TIMEOUT)
     
     if response.status_code == 200:
         logging.info("Using app registration authentication")
-        return response.json()['access_token']
+        token_info = response_json(response)
+        with _token_lock:
+            _token_cache['token'] = token_info['access_token']
+            _token_cache['expires'] = time.monotonic() + int(token_info.get('expires_in', 0)) - TOKEN_REFRESH_MARGIN
+        return token_info['access_token']
     else:
         logging.error(f"Token request failed: {response.status_code} - {response.text}")
         raise Exception(f"Failed to obtain access token: {response.status_code}")
 
 
-def graph_request(endpoint, token, method='GET', data=None, content_type='application/json'):
-    """Make a request to Microsoft Graph API."""
+def dumps_json(obj):
+    """Serialise a Graph request body to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def response_json(response):
+    """Decode a Graph JSON response body."""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def graph_request(endpoint, token, method='GET', data=None, content_type='application/json', headers=None,
+                  stream=False):
+    """Make a request to Microsoft Graph API (extra headers are merged in)."""
     headers = {
         'Authorization': f'Bearer {token}',
-        'Content-Type': content_type
+        'Content-Type': content_type,
+        **(headers or {})
     }
     
     url = f"https://graph.microsoft.com/v1.0{endpoint}"
     
-    if method == 'GET':
-        response = requests.get(url, headers=headers)
-    elif method == 'PUT':
-        response = requests.put(url, headers=headers, data=data)
-    elif method == 'POST':
-        response = requests.post(url, headers=headers, 
-                                json=data if content_type == 'application/json' else None, 
-                                data=data if content_type != 'application/json' else None)
-    elif method == 'PATCH':
-        response = requests.patch(url, headers=headers, json=data)
+    if method in ('POST', 'PATCH') and content_type == 'application/json' and data is not None:
+        response = _session.request(method, url, headers=headers, data=dumps_json(data), stream=stream,
+                                    timeout=HTTP_TIMEOUT)
+    else:
+        response = _session.request(method, url, headers=headers, data=data, stream=stream,
+                                    timeout=HTTP_TIMEOUT)
     
     return response
 
 
-def resolve_file_path(file_path, token):
-    """Resolve a SharePoint file path to a file ID, with caching."""
-    global _file_id_cache, _cache_expiry
-    
-    now = datetime.utcnow()
-    if _cache_expiry and now < _cache_expiry and file_path in _file_id_cache:
-        return _file_id_cache[file_path]
+def encode_path(path):
+    """Percent-encode a drive path for use in a Graph URL (keeps '/' separators)."""
+    return quote(path, safe='/')
+
+
+def get_cached_file_id(file_path):
+    """Return the cached file ID for a path, or None if missing or expired."""
+    with _file_id_cache_lock:
+        entry = _file_id_cache.get(file_path)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[1]:
+            del _file_id_cache[file_path]
+            return None
+        return entry[0]
+
+
+def cache_file_id(file_path, file_id):
+    """Cache a resolved file ID for FILE_ID_CACHE_TTL, evicting the oldest 10% when full."""
+    with _file_id_cache_lock:
+        _file_id_cache[file_path] = (file_id, time.monotonic() + FILE_ID_CACHE_TTL)
+        if len(_file_id_cache) > FILE_ID_CACHE_MAX_ENTRIES:
+            by_deadline = sorted(_file_id_cache, key=lambda p: _file_id_cache[p][1])
+            for stale_path in by_deadline[:max(1, len(by_deadline) // 10)]:
+                del _file_id_cache[stale_path]
+
+
+def load_file_id_cache():
+    """Seed the file ID cache from FILE_ID_CACHE_PATH, skipping expired entries."""
+    try:
+        with open(FILE_ID_CACHE_PATH, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        entries = saved['entries']
+    except (OSError, ValueError, KeyError, TypeError):
+        return
+    
+    if saved.get('drive_id') != DRIVE_ID or not isinstance(entries, dict):
+        return
+    
+    # Entries are saved with wall-clock expiry; convert back to monotonic deadlines
+    wall_now, mono_now = time.time(), time.monotonic()
+    with _file_id_cache_lock:
+        for file_path, entry in entries.items():
+            try:
+                file_id, expires_at = entry
+                remaining = float(expires_at) - wall_now
+            except (ValueError, TypeError):
+                continue
+            if remaining > 0:
+                _file_id_cache[file_path] = (file_id, mono_now + remaining)
+    logging.info(f"Loaded {len(_file_id_cache)} cached file IDs from {FILE_ID_CACHE_PATH}")
+
+
+def save_file_id_cache(force=False):
+    """Write the file ID cache to FILE_ID_CACHE_PATH (atomic replace, rate limited)."""
+    global _file_id_cache_saved_at
+    
+    with _file_id_cache_lock:
+        if not force and time.time() - _file_id_cache_saved_at < FILE_ID_CACHE_SAVE_INTERVAL:
+            return
+        # Monotonic deadlines are stored as wall-clock time for other processes
+        wall_now, mono_now = time.time(), time.monotonic()
+        entries = {
+            file_path: [file_id, wall_now + (deadline - mono_now)]
+            for file_path, (file_id, deadline) in _file_id_cache.items()
+            if deadline > mono_now
+        }
+        snapshot = {'drive_id': DRIVE_ID, 'entries': entries}
+        _file_id_cache_saved_at = wall_now
     
-    if not _cache_expiry or now >= _cache_expiry:
-        _file_id_cache = {}
-        _cache_expiry = now + timedelta(hours=24)
+    try:
+        tmp_path = f"{FILE_ID_CACHE_PATH}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, FILE_ID_CACHE_PATH)
+    except OSError as e:
+        logging.warning(f"Could not persist file ID cache: {e}")
+
+
+load_file_id_cache()
+
+
+def resolve_file_path(file_path, token):
+    """Resolve a SharePoint file path to a file ID, with caching (only the id is fetched)."""
+    file_id = get_cached_file_id(file_path)
+    if file_id:
+        return file_id
     
-    encoded_path = file_path.replace(' ', '%20').replace('&', '%26')
-    endpoint = f"/drives/{DRIVE_ID}/root:{encoded_path}"
+    encoded_path = encode_path(file_path)
+    endpoint = f"/drives/{DRIVE_ID}/root:{encoded_path}?$select=id"
     
     response = graph_request(endpoint, token)
     
@@ -204,61 +379,193 @@ def resolve_file_path(file_path, token):
     if response.status_code >= 400:
         raise Exception(f"Graph API error: {response.status_code} - {response.text}")
     
-    file_info = response.json()
+    file_info = response_json(response)
     file_id = file_info['id']
     
-    _file_id_cache[file_path] = file_id
+    cache_file_id(file_path, file_id)
+    save_file_id_cache()
     return file_id
 
 
+def resolve_file_paths_batch(file_paths, token):
+    """
+    Resolve many SharePoint file paths to file IDs using the Graph $batch endpoint.
+    
+    Paths already in the cache are answered locally; the rest are looked up
+    GRAPH_BATCH_LIMIT at a time. Throttled (429) sub-requests are retried after
+    the largest Retry-After the batch reported. Lookups that fail for any
+    other reason are logged and left out of the result, so the caller's own
+    resolve_file_path retries them and reports the error for that file alone.
+    
+    Returns:
+        dict: {file_path: file_id or None if the file doesn't exist}
+    """
+    results = {}
+    pending = []
+    for file_path in dict.fromkeys(file_paths):
+        file_id = get_cached_file_id(file_path)
+        if file_id:
+            results[file_path] = file_id
+        else:
+            pending.append(file_path)
+    
+    for start in range(0, len(pending), GRAPH_BATCH_LIMIT):
+        chunk = pending[start:start + GRAPH_BATCH_LIMIT]
+        batch_requests = []
+        for i, file_path in enumerate(chunk):
+            encoded_path = encode_path(file_path)
+            batch_requests.append({
+                'id': str(i),
+                'method': 'GET',
+                'url': f"/drives/{DRIVE_ID}/root:{encoded_path}?$select=id"
+            })
+        
+        while batch_requests:
+            response = graph_request('/$batch', token, method='POST', data={'requests': batch_requests})
+            if response.status_code >= 400:
+                logging.warning(f"Graph batch error: {response.status_code} - {response.text} - "
+                                f"leaving {len(batch_requests)} paths unresolved")
+                break
+            
+            requests_by_id = {r['id']: r for r in batch_requests}
+            throttled = []
+            retry_after = 0
+            
+            for sub_response in response_json(response).get('responses', []):
+                sub_id = sub_response.get('id')
+                if sub_id not in requests_by_id:
+                    continue
+                file_path = chunk[int(sub_id)]
+                status = sub_response.get('status', 500)
+                
+                if status == 429:
+                    throttled.append(requests_by_id[sub_id])
+                    headers = sub_response.get('headers') or {}
+                    retry_after = max(retry_after, int(headers.get('Retry-After', 1)))
+                elif status == 404:
+                    results[file_path] = None  # File doesn't exist
+                elif status >= 400:
+                    logging.warning(f"Graph API error for {file_path}: {status} - {sub_response.get('body')} - "
+                                    f"left unresolved")
+                else:
+                    file_id = sub_response['body']['id']
+                    cache_file_id(file_path, file_id)
+                    results[file_path] = file_id
+            
+            if throttled:
+                logging.warning(f"Graph batch throttled {len(throttled)} lookups - retrying in {retry_after}s")
+                time.sleep(retry_after)
+            batch_requests = throttled
+    
+    if pending:
+        save_file_id_cache(force=True)
+    
+    logging.info(f"Resolved {len(results)} file paths ({len(pending)} via batch)")
+    return results
+
+
 def file_exists(file_path, token):
-    """Check if a file exists at the given path."""
-    file_id = resolve_file_path(file_path, token)
-    return file_id is not None
+    """Check if a file exists at the given path (cached IDs answer without a Graph call)."""
+    return resolve_file_path(file_path, token) is not None
 
 
 def download_excel_file(file_id, token):
-    """Download an Excel file from SharePoint."""
+    """
+    Download an Excel file from SharePoint.
+    
+    The body is streamed in chunks into a spooled buffer (kept in memory up to
+    DOWNLOAD_SPOOL_MAX_SIZE, spilled to disk beyond that) rather than held
+    twice as response.content + BytesIO.
+    """
     endpoint = f"/drives/{DRIVE_ID}/items/{file_id}/content"
-    response = graph_request(endpoint, token)
-    if response.status_code >= 400:
-        raise Exception(f"Failed to download file: {response.status_code}")
-    return BytesIO(response.content)
+    with graph_request(endpoint, token, stream=True) as response:
+        if response.status_code >= 400:
+            raise Exception(f"Failed to download file: {response.status_code}")
+        
+        buffer = SpooledTemporaryFile(max_size=DOWNLOAD_SPOOL_MAX_SIZE)
+        for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            buffer.write(chunk)
+    
+    buffer.seek(0)
+    return buffer
 
 
 def upload_excel_file(file_path, file_content, token):
-    """Upload an Excel file to SharePoint (creates or overwrites)."""
-    encoded_path = file_path.replace(' ', '%20').replace('&', '%26')
-    endpoint = f"/drives/{DRIVE_ID}/root:{encoded_path}:/content"
+    """
+    Upload an Excel file to SharePoint (creates or overwrites).
     
-    if isinstance(file_content, BytesIO):
-        file_content.seek(0)
-        data = file_content.read()
+    Files larger than UPLOAD_SESSION_THRESHOLD go through a Graph upload
+    session in UPLOAD_CHUNK_SIZE pieces instead of a single PUT. The
+    uploaded item's ID is added to the file ID cache.
+    """
+    encoded_path = encode_path(file_path)
+    
+    if isinstance(file_content, (bytes, bytearray)):
+        file_content = BytesIO(file_content)
+    file_content.seek(0, os.SEEK_END)
+    total_size = file_content.tell()
+    file_content.seek(0)
+    
+    if total_size > UPLOAD_SESSION_THRESHOLD:
+        response = upload_large_file(encoded_path, file_content, total_size, token)
     else:
-        data = file_content
+        endpoint = f"/drives/{DRIVE_ID}/root:{encoded_path}:/content"
+        response = graph_request(endpoint, token, method='PUT', data=file_content.read(),
+                                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        
+        if response.status_code >= 400:
+            raise Exception(f"Failed to upload file: {response.status_code} - {response.text}")
     
-    response = graph_request(endpoint, token, method='PUT', data=data,
-                            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    # Both paths answer with the driveItem - cache its ID so a follow-up
+    # resolve_file_path (e.g. right after template creation) needs no lookup
+    if response.status_code in (200, 201):
+        file_id = response_json(response).get('id')
+        if file_id:
+            cache_file_id(file_path, file_id)
     
+    return response
+
+
+def upload_large_file(encoded_path, file_content, total_size, token):
+    """Upload a file through a Graph upload session, one chunk in memory at a time."""
+    endpoint = f"/drives/{DRIVE_ID}/root:{encoded_path}:/createUploadSession"
+    response = graph_request(endpoint, token, method='POST',
+                             data={'item': {'@microsoft.graph.conflictBehavior': 'replace'}})
     if response.status_code >= 400:
-        raise Exception(f"Failed to upload file: {response.status_code} - {response.text}")
+        raise Exception(f"Failed to create upload session: {response.status_code} - {response.text}")
+    
+    upload_url = response_json(response)['uploadUrl']
+    
+    # The upload URL is pre-authorised - Graph rejects an Authorization header on it
+    start = 0
+    while start < total_size:
+        chunk = file_content.read(UPLOAD_CHUNK_SIZE)
+        end = start + len(chunk) - 1
+        response = _session.put(upload_url, data=chunk, timeout=HTTP_TIMEOUT, headers={
+            'Content-Length': str(len(chunk)),
+            'Content-Range': f"bytes {start}-{end}/{total_size}"
+        })
+        if response.status_code >= 400:
+            _session.delete(upload_url, timeout=HTTP_TIMEOUT)
+            raise Exception(f"Failed to upload file chunk: {response.status_code} - {response.text}")
+        start = end + 1
     
     return response
 
 
 def create_folder(folder_path, token):
     """Create a folder in SharePoint if it doesn't exist."""
-    encoded_path = folder_path.replace(' ', '%20').replace('&', '%26')
+    encoded_path = encode_path(folder_path)
     endpoint = f"/drives/{DRIVE_ID}/root:{encoded_path}"
     response = graph_request(endpoint, token)
     
     if response.status_code == 200:
-        return response.json()['id']
+        return response_json(response)['id']
     
     parent_path = '/'.join(folder_path.rsplit('/', 1)[:-1]) or '/'
     folder_name = folder_path.rsplit('/', 1)[-1]
     
-    encoded_parent = parent_path.replace(' ', '%20').replace('&', '%26')
+    encoded_parent = encode_path(parent_path)
     endpoint = f"/drives/{DRIVE_ID}/root:{encoded_parent}:/children"
     
     data = {
@@ -272,13 +579,241 @@ def create_folder(folder_path, token):
     if response.status_code >= 400:
         raise Exception(f"Failed to create folder: {response.status_code}")
     
-    return response.json()['id']
+    return response_json(response)['id']
+
+
+# =============================================================================
+# XLSX PACKAGE HELPERS
+# =============================================================================
+
+XLSX_NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+XLSX_NS_PKG = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+XLSX_WORKBOOK_PART = 'xl/workbook.xml'
+
+
+def read_part_rels(archive, part):
+    """
+    Read the relationships of one package part.
+    
+    Returns:
+        dict: {rel_id: (rel_type, target_part)} e.g. {'rId1': ('worksheet', 'xl/worksheets/sheet1.xml')}
+    """
+    rels_path = posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+    if rels_path not in archive.namelist():
+        return {}
+    
+    rels = {}
+    for rel in ET.fromstring(archive.read(rels_path)).iter(f'{XLSX_NS_PKG}Relationship'):
+        target = rel.get('Target')
+        if target.startswith('/'):
+            target = target.lstrip('/')
+        else:
+            target = posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+        rels[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], target)
+    return rels
+
+
+def read_sheet_parts(archive):
+    """Map each worksheet title to its XML part inside the package."""
+    workbook_rels = read_part_rels(archive, XLSX_WORKBOOK_PART)
+    
+    sheet_parts = {}
+    for sheet in ET.fromstring(archive.read(XLSX_WORKBOOK_PART)).iter(f'{XLSX_NS_MAIN}sheet'):
+        _, sheet_part = workbook_rels.get(sheet.get(f'{XLSX_NS_REL}id'), (None, None))
+        if sheet_part:
+            sheet_parts[sheet.get('name')] = sheet_part
+    return sheet_parts
+
+
+def read_table_refs(file_content):
+    """
+    Read table ranges straight from the .xlsx package.
+    
+    Read-only worksheets don't expose ws.tables, so the table parts are
+    resolved from workbook.xml and the sheet relationships instead.
+    
+    Args:
+        file_content: BytesIO (or path) of the workbook
+        
+    Returns:
+        dict: {sheet_title: {table_name: ref}}
+    """
+    table_refs = {}
+    with zipfile.ZipFile(file_content) as archive:
+        for sheet_name, sheet_part in read_sheet_parts(archive).items():
+            tables = {}
+            for rel_type, target in read_part_rels(archive, sheet_part).values():
+                if rel_type == 'table':
+                    table = ET.fromstring(archive.read(target))
+                    tables[table.get('name') or table.get('displayName')] = table.get('ref')
+            table_refs[sheet_name] = tables
+    
+    if hasattr(file_content, 'seek'):
+        file_content.seek(0)
+    
+    return table_refs
+
+
+def read_number_formats(archive, styles_part):
+    """
+    Find which cell style indexes carry date / duration number formats.
+    
+    Returns:
+        tuple: (date_style_ids, timedelta_style_ids)
+    """
+    date_styles, timedelta_styles = set(), set()
+    if not styles_part:
+        return date_styles, timedelta_styles
+    
+    styles = ET.fromstring(archive.read(styles_part))
+    custom_formats = {
+        int(fmt.get('numFmtId')): fmt.get('formatCode')
+        for fmt in styles.iter(f'{XLSX_NS_MAIN}numFmt')
+    }
+    
+    cell_xfs = styles.find(f'{XLSX_NS_MAIN}cellXfs')
+    for idx, xf in enumerate(cell_xfs if cell_xfs is not None else []):
+        num_fmt_id = int(xf.get('numFmtId', 0))
+        fmt = custom_formats.get(num_fmt_id) or builtin_format_code(num_fmt_id)
+        if is_date_format(fmt):
+            date_styles.add(idx)
+        if is_timedelta_format(fmt):
+            timedelta_styles.add(idx)
+    
+    return date_styles, timedelta_styles
+
+
+def read_xlsx_sheets(file_content, sheet_names, max_rows=None):
+    """
+    Read whole worksheets as value tuples straight from the .xlsx XML.
+    
+    A lightweight alternative to load_workbook(read_only=True, data_only=True)
+    for small tabular sheets - only the requested sheets, the shared strings
+    and the number formats are parsed. Values are typed the way openpyxl
+    types them (int/float, bool, str, and datetimes for date-formatted cells).
+    
+    Args:
+        file_content: BytesIO (or path) of the workbook
+        sheet_names: Worksheet titles to read
+        max_rows: Optional {sheet_name: last row needed} - parsing of that sheet
+            stops once the row is passed
+        
+    Returns:
+        dict: {sheet_name: [row tuple, ...]} - index 0 is row 1, every row padded
+        to the sheet width. Sheets not in the workbook are omitted.
+    """
+    cell_tag = f'{XLSX_NS_MAIN}c'
+    row_tag = f'{XLSX_NS_MAIN}row'
+    value_tag = f'{XLSX_NS_MAIN}v'
+    inline_tag = f'{XLSX_NS_MAIN}is'
+    dimension_tag = f'{XLSX_NS_MAIN}dimension'
+    
+    sheets = {}
+    with zipfile.ZipFile(file_content) as archive:
+        workbook = ET.fromstring(archive.read(XLSX_WORKBOOK_PART))
+        workbook_pr = workbook.find(f'{XLSX_NS_MAIN}workbookPr')
+        date1904 = workbook_pr is not None and workbook_pr.get('date1904') in ('1', 'true')
+        epoch = CALENDAR_MAC_1904 if date1904 else CALENDAR_WINDOWS_1900
+        
+        parts = {rel_type: target for rel_type, target in read_part_rels(archive, XLSX_WORKBOOK_PART).values()}
+        sheet_parts = read_sheet_parts(archive)
+        wanted = [name for name in dict.fromkeys(sheet_names) if name in sheet_parts]
+        if not wanted:
+            return sheets
+        
+        shared_strings = []
+        if parts.get('sharedStrings') in archive.namelist():
+            with archive.open(parts['sharedStrings']) as source:
+                shared_strings = read_string_table(source)
+        date_styles, timedelta_styles = read_number_formats(archive, parts.get('styles'))
+        
+        for sheet_name in wanted:
+            cells = {}
+            max_row = max_col = 0
+            row_idx = 0
+            row_limit = (max_rows or {}).get(sheet_name)
+            
+            with archive.open(sheet_parts[sheet_name]) as source:
+                for _, element in ET.iterparse(source):
+                    if element.tag == dimension_tag:
+                        _, _, dim_col, dim_row = range_boundaries(element.get('ref'))
+                        max_col, max_row = dim_col or 0, dim_row or 0
+                        continue
+                    if element.tag != row_tag:
+                        continue
+                    
+                    row_idx = int(element.get('r', row_idx + 1))
+                    if row_limit and row_idx > row_limit:
+                        break
+                    col_idx = 0
+                    row_values = {}
+                    for cell in element.iter(cell_tag):
+                        coordinate = cell.get('r')
+                        col_idx = coordinate_to_tuple(coordinate)[1] if coordinate else col_idx + 1
+                        data_type = cell.get('t', 'n')
+                        
+                        if data_type == 'inlineStr':
+                            child = cell.find(inline_tag)
+                            value = Text.from_tree(child).content if child is not None else None
+                        else:
+                            value = cell.findtext(value_tag) or None
+                            if value is None:
+                                pass
+                            elif data_type == 'n':
+                                value = float(value) if any(c in value for c in '.Ee') else int(value)
+                                style_id = int(cell.get('s', 0))
+                                if style_id in date_styles:
+                                    try:
+                                        value = from_excel(value, epoch, timedelta=style_id in timedelta_styles)
+                                    except (OverflowError, ValueError):
+                                        value = '#VALUE!'
+                            elif data_type == 's':
+                                value = shared_strings[int(value)]
+                            elif data_type == 'b':
+                                value = bool(int(value))
+                            elif data_type == 'd':
+                                value = from_ISO8601(value)
+                        
+                        row_values[col_idx] = value
+                        max_col = max(max_col, col_idx)
+                    
+                    cells[row_idx] = row_values
+                    max_row = max(max_row, row_idx)
+                    element.clear()
+            
+            if row_limit:
+                max_row = min(max_row, row_limit)
+            sheets[sheet_name] = [
+                tuple(cells.get(r, {}).get(c) for c in range(1, max_col + 1))
+                for r in range(1, max_row + 1)
+            ]
+    
+    if hasattr(file_content, 'seek'):
+        file_content.seek(0)
+    
+    return sheets
 
 
 # =============================================================================
 # CONFIG LOADING
 # =============================================================================
 
+def parse_bool(value):
+    """Read an Excel TRUE/FALSE cell (bool, number or text) as a bool."""
+    if isinstance(value, str):
+        return value.strip().upper() == 'TRUE'
+    return bool(value)
+
+
+def build_therapist(headers, row):
+    """Build a therapist record from a Config_Therapists row, coercing its flag columns."""
+    therapist = dict(zip(headers, row))
+    therapist['IsActive'] = parse_bool(therapist.get('IsActive', True))
+    therapist['IsTeamLeader'] = parse_bool(therapist.get('IsTeamLeader', False))
+    return therapist
+
+
 def load_config(token):
     """Load all configuration from the master Excel file."""
     logging.info("Loading configuration...")
@@ -287,50 +822,52 @@ def load_config(token):
     if not file_id:
         raise Exception(f"Config file not found: {CONFIG_FILE_PATH}")
     
-    file_content = download_excel_file(file_id, token)
-    wb = load_workbook(file_content, data_only=True)
+    # Conditional metadata GET - Graph answers 304 while the cached ETag is current.
+    # A 200 carrying the same ETag (If-None-Match not honoured) is also a hit.
+    cached_etag = _config_cache['etag']
+    response = graph_request(f"/drives/{DRIVE_ID}/items/{file_id}?$select=eTag", token,
+                             headers={'If-None-Match': cached_etag} if cached_etag else None)
+    etag = response_json(response).get('eTag') if 200 <= response.status_code < 300 else None
+    if _config_cache['value'] is not None and (
+            response.status_code == 304 or (etag and etag == cached_etag)):
+        logging.info("Config unchanged since last load - using cached configuration")
+        return _config_cache['value']
+    
+    # The threshold sheets are fixed layouts - nothing below row 17 (Physio) / 5 (OT) is read
+    with download_excel_file(file_id, token) as file_content:
+        sheets = read_xlsx_sheets(file_content, CONFIG_SHEETS.values(), max_rows={
+            CONFIG_SHEETS['thresholds_physio']: 17,
+            CONFIG_SHEETS['thresholds_ot']: 5
+        })
     config = {}
     
     # Load therapists
-    if CONFIG_SHEETS['therapists'] in wb.sheetnames:
-        ws = wb[CONFIG_SHEETS['therapists']]
-        config['therapists'] = []
-        headers = [cell.value for cell in ws[1]]
-        
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if row[0]:
-                therapist = dict(zip(headers, row))
-                therapist['IsActive'] = str(therapist.get('IsActive', 'TRUE')).upper() == 'TRUE'
-                is_leader = therapist.get('IsTeamLeader', False)
-                if isinstance(is_leader, str):
-                    therapist['IsTeamLeader'] = is_leader.upper() == 'TRUE'
-                else:
-                    therapist['IsTeamLeader'] = bool(is_leader)
-                config['therapists'].append(therapist)
+    if CONFIG_SHEETS['therapists'] in sheets:
+        rows = sheets[CONFIG_SHEETS['therapists']]
+        headers = list(rows[0]) if rows else []
+        config['therapists'] = [build_therapist(headers, row) for row in rows[1:] if row[0]]
         
         logging.info(f"Loaded {len(config['therapists'])} therapists")
     
     # Load teams
-    if CONFIG_SHEETS['teams'] in wb.sheetnames:
-        ws = wb[CONFIG_SHEETS['teams']]
-        config['teams'] = {}
-        headers = [cell.value for cell in ws[1]]
-        
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if row[0]:
-                team = dict(zip(headers, row))
-                config['teams'][team['TeamId']] = team
+    if CONFIG_SHEETS['teams'] in sheets:
+        rows = sheets[CONFIG_SHEETS['teams']]
+        headers = list(rows[0]) if rows else []
+        teams = (dict(zip(headers, row)) for row in rows[1:] if row[0])
+        config['teams'] = {team['TeamId']: team for team in teams}
         
         logging.info(f"Loaded {len(config['teams'])} teams")
     
-    # Load thresholds
+    # Load thresholds - the Physio sheet also carries the ceased (rows 8-9) and
+    # rating scale (rows 13-17) blocks, so its rows are fetched once and shared
     config['thresholds'] = {'Physio': {}, 'OT': {}}
+    physio_rows = sheets.get(CONFIG_SHEETS['thresholds_physio'])
     
     for team_type, sheet_key in [('Physio', 'thresholds_physio'), ('OT', 'thresholds_ot')]:
-        if CONFIG_SHEETS[sheet_key] in wb.sheetnames:
-            ws = wb[CONFIG_SHEETS[sheet_key]]
+        if CONFIG_SHEETS[sheet_key] in sheets:
+            rows = physio_rows if team_type == 'Physio' else sheets[CONFIG_SHEETS[sheet_key]]
             
-            for row in ws.iter_rows(min_row=2, max_row=5, values_only=True):
+            for row in rows[1:5]:
                 if row[0] and row[0] in ['Grad', 'CA', 'Senior', 'Team Average']:
                     config['thresholds'][team_type][row[0]] = {
                         'red_below': row[1],
@@ -343,9 +880,8 @@ def load_config(token):
     
     # Load ceased service thresholds
     config['ceased_thresholds'] = {}
-    if CONFIG_SHEETS['thresholds_physio'] in wb.sheetnames:
-        ws = wb[CONFIG_SHEETS['thresholds_physio']]
-        for row in ws.iter_rows(min_row=8, max_row=9, values_only=True):
+    if physio_rows is not None:
+        for row in physio_rows[7:9]:
             if row[0] and 'Ceased %' in str(row[0]):
                 config['ceased_thresholds'] = {
                     'blue_below': row[1],
@@ -374,9 +910,8 @@ def load_config(token):
     
     # Load 1-5 rating scale thresholds
     config['rating_thresholds'] = []
-    if CONFIG_SHEETS['thresholds_physio'] in wb.sheetnames:
-        ws = wb[CONFIG_SHEETS['thresholds_physio']]
-        for row in ws.iter_rows(min_row=13, max_row=17, values_only=True):
+    if physio_rows is not None:
+        for row in physio_rows[12:17]:
             if row[0] and isinstance(row[0], (int, float)) and 1 <= row[0] <= 5:
                 config['rating_thresholds'].append({
                     'rating': row[0],
@@ -399,14 +934,16 @@ def load_config(token):
     
     # Load competency history
     config['competency_history'] = []
-    if CONFIG_SHEETS['competency_history'] in wb.sheetnames:
-        ws = wb[CONFIG_SHEETS['competency_history']]
-        headers = [cell.value for cell in ws[1]]
+    if CONFIG_SHEETS['competency_history'] in sheets:
+        rows = sheets[CONFIG_SHEETS['competency_history']]
+        headers = list(rows[0]) if rows else []
+        # Undated rows are dropped, so test the date cell before building a record dict
+        date_col = headers.index('EffectiveDate') if 'EffectiveDate' in headers else None
         
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            if row[0]:
+        for row in rows[1:]:
+            if row[0] and date_col is not None and date_col < len(row) and row[date_col]:
                 record = dict(zip(headers, row))
-                effective_date = record.get('EffectiveDate')
+                effective_date = record['EffectiveDate']
                 if effective_date:
                     if hasattr(effective_date, 'date'):
                         record['EffectiveDate'] = effective_date.date()
@@ -424,11 +961,11 @@ def load_config(token):
         
     # Load team average threshold history (for tracking team benchmark changes over time)
     config['team_ave_thresholds'] = []
-    if CONFIG_SHEETS.get('team_ave_thresholds') and CONFIG_SHEETS['team_ave_thresholds'] in wb.sheetnames:
-        ws = wb[CONFIG_SHEETS['team_ave_thresholds']]
-        headers = [cell.value for cell in ws[1]]
+    if CONFIG_SHEETS.get('team_ave_thresholds') and CONFIG_SHEETS['team_ave_thresholds'] in sheets:
+        rows = sheets[CONFIG_SHEETS['team_ave_thresholds']]
+        headers = list(rows[0]) if rows else []
         
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for row in rows[1:]:
             if row[0]:  # Has a team name
                 record = dict(zip(headers, row))
                 # Ensure EffectiveDate is a date object
@@ -452,17 +989,74 @@ def load_config(token):
         logging.info("No Config_TeamAve_Thresholds sheet found - using static Team Average thresholds")
     
     # Load colours
-    if CONFIG_SHEETS['colours'] in wb.sheetnames:
-        ws = wb[CONFIG_SHEETS['colours']]
+    if CONFIG_SHEETS['colours'] in sheets:
+        rows = sheets[CONFIG_SHEETS['colours']]
         config['colours'] = {}
         
-        for row in ws.iter_rows(min_row=2, values_only=True):
+        for row in rows[1:]:
             if row[0]:
                 config['colours'][row[0]] = row[1]
     else:
         config['colours'] = DEFAULT_COLORS
     
-    wb.close()
+    build_config_indexes(config)
+    
+    if etag:
+        _config_cache['etag'] = etag
+        _config_cache['value'] = config
+    return config
+
+
+def normalize_name(name):
+    """Case/whitespace-insensitive key used for therapist name lookups."""
+    return str(name or '').strip().lower()
+
+
+def as_date(value):
+    """Normalise a datetime to its date (dates pass through)."""
+    return value.date() if isinstance(value, datetime) else value
+
+
+def build_config_indexes(config):
+    """
+    Add lookup indexes to a loaded config.
+    
+    History lists hold dated records only, oldest first, with a parallel list
+    of their dates for bisect lookups.
+    
+    - _competency_by_name / _competency_dates_by_name: {normalized name: [...]}
+    - _therapist_by_name: {normalized name: therapist row}
+    - _team_ave_by_team / _team_ave_dates_by_team: {team name: [...]}
+    """
+    competency_by_name = {}
+    for record in config.get('competency_history', []):
+        if record.get('EffectiveDate'):
+            competency_by_name.setdefault(normalize_name(record.get('Name')), []).append(record)
+    for records in competency_by_name.values():
+        records.sort(key=lambda r: as_date(r['EffectiveDate']))
+    config['_competency_by_name'] = competency_by_name
+    config['_competency_dates_by_name'] = {
+        name: [as_date(r['EffectiveDate']) for r in records]
+        for name, records in competency_by_name.items()
+    }
+    
+    therapist_by_name = {}
+    for therapist in config.get('therapists', []):
+        therapist_by_name.setdefault(normalize_name(therapist.get('Name')), therapist)
+    config['_therapist_by_name'] = therapist_by_name
+    
+    team_ave_by_team = {}
+    for record in config.get('team_ave_thresholds', []):
+        if record.get('EffectiveDate'):
+            team_ave_by_team.setdefault(str(record.get('Team') or '').strip(), []).append(record)
+    for records in team_ave_by_team.values():
+        records.sort(key=lambda r: as_date(r['EffectiveDate']))
+    config['_team_ave_by_team'] = team_ave_by_team
+    config['_team_ave_dates_by_team'] = {
+        team: [as_date(r['EffectiveDate']) for r in records]
+        for team, records in team_ave_by_team.items()
+    }
+    
     return config
 
 
@@ -473,7 +1067,7 @@ def load_config(token):
 def extract_year_from_filename(file_path):
     """Extract year from filename like 'Team_Leader_2026.xlsx'."""
     filename = file_path.split('/')[-1]
-    match = re.search(r'(\d{4})', filename)
+    match = YEAR_PATTERN.search(filename)
     if match:
         year = int(match.group(1))
         if 2020 <= year <= 2100:
@@ -484,32 +1078,41 @@ def extract_year_from_filename(file_path):
     return current_year
 
 
-def get_competency_for_month(therapist_name, month_name, year, config):
-    """Get the competency that was active for a therapist in a specific month."""
+@lru_cache(maxsize=8)
+def month_midpoints(year):
+    """The 15th of each month of a year (Jan first), built once per year."""
+    return tuple(date(year, month, 15) for month in range(1, 13))
+
+
+@lru_cache(maxsize=None)
+def mid_month_date(month_name, year):
+    """Reference date (the 15th) used to decide which competency applies in a month."""
     month_num = MONTH_NAME_TO_NUM.get(month_name)
     if not month_num:
+        return None
+    return month_midpoints(year)[month_num - 1]
+
+
+def get_competency_for_month(therapist_name, month_name, year, config):
+    """Get the competency that was active for a therapist in a specific month."""
+    target_date = mid_month_date(month_name, year)
+    if not target_date:
         logging.warning(f"Unknown month name: {month_name}")
         return None
     
-    target_date = date(year, month_num, 15)
+    if '_competency_by_name' not in config:
+        build_config_indexes(config)
     
-    history = config.get('competency_history', [])
-    therapist_records = [
-        r for r in history 
-        if r.get('Name', '').strip().lower() == therapist_name.strip().lower()
-    ]
+    key = normalize_name(therapist_name)
     
-    if therapist_records:
-        therapist_records.sort(key=lambda r: r.get('EffectiveDate', date.min), reverse=True)
-        
-        for record in therapist_records:
-            effective_date = record.get('EffectiveDate')
-            if effective_date and effective_date <= target_date:
-                return record.get('Competency')
+    # Latest record effective on or before the target date
+    idx = bisect_right(config['_competency_dates_by_name'].get(key, ()), target_date) - 1
+    if idx >= 0:
+        return config['_competency_by_name'][key][idx].get('Competency')
     
-    for therapist in config.get('therapists', []):
-        if therapist.get('Name', '').strip().lower() == therapist_name.strip().lower():
-            return therapist.get('Competency')
+    therapist = config['_therapist_by_name'].get(key)
+    if therapist:
+        return therapist.get('Competency')
     
     return None
 
@@ -518,114 +1121,104 @@ def get_competency_for_month(therapist_name, month_name, year, config):
 # KPI DATA LOADING
 # =============================================================================
 
-def read_table_data(ws, table_name, kpi_column_name):
-    """Read data from one Excel table."""
-    result = {}
+def read_table_into(ws, table_name, kpi_column_name, records_by_name_month, record_template, table_refs=None,
+                    months=MONTH_COLUMNS):
+    """
+    Read one Excel table straight into the sheet's monthly records.
     
+    Values land in the flat {(name, month): record} map as rows are read;
+    a therapist seen for the first time gets a record for every month in
+    months, copied from record_template.
+    """
     try:
-        if table_name not in ws.tables:
+        # Read-only worksheets have no ws.tables - fall back to pre-parsed refs
+        if table_refs is not None:
+            tables = table_refs.get(ws.title, {})
+        else:
+            tables = dict(ws.tables.items())
+        
+        if table_name not in tables:
             logging.warning(f"Table '{table_name}' not found in worksheet '{ws.title}'")
-            return result
+            return
         
-        table = ws.tables[table_name]
-        table_range = table.ref
+        table_range = tables[table_name]
         
-        from openpyxl.utils import range_boundaries
         min_col, min_row, max_col, max_row = range_boundaries(table_range)
         
-        header_row = []
-        for col in range(min_col, max_col + 1):
-            cell_value = ws.cell(row=min_row, column=col).value
-            header_row.append(cell_value)
+        rows_iter = ws.iter_rows(min_row=min_row, max_row=max_row,
+                                 min_col=min_col, max_col=max_col, values_only=True)
+        header_row = next(rows_iter, ())
         
+        month_set = MONTH_SET if months is MONTH_COLUMNS else frozenset(months)
         month_indices = {}
         for i, header in enumerate(header_row):
-            if header in MONTH_COLUMNS:
+            if header in month_set:
                 month_indices[header] = i
+        month_offsets = list(month_indices.items())
         
-        for row_idx in range(min_row + 1, max_row + 1):
-            name_cell = ws.cell(row=row_idx, column=min_col)
-            therapist_name = name_cell.value
+        # The scan is bounded by the table's own ref; blank-name rows are skipped
+        therapist_names = set()
+        for row in rows_iter:
+            therapist_name = row[0]
             
             if not therapist_name:
                 continue
             
             therapist_name = str(therapist_name).strip()
+            therapist_names.add(therapist_name)
             
-            if therapist_name not in result:
-                result[therapist_name] = {}
+            if (therapist_name, months[0]) not in records_by_name_month:
+                for month in months:
+                    record = record_template.copy()
+                    record['Name'] = therapist_name
+                    record['Month'] = month
+                    records_by_name_month[(therapist_name, month)] = record
             
-            for month in MONTH_COLUMNS:
-                if month in month_indices:
-                    col_offset = month_indices[month]
-                    cell = ws.cell(row=row_idx, column=min_col + col_offset)
-                    value = cell.value
-                    result[therapist_name][month] = value
+            for month, col_offset in month_offsets:
+                records_by_name_month[(therapist_name, month)][kpi_column_name] = row[col_offset]
         
-        logging.info(f"Read {len(result)} therapists from table '{table_name}'")
+        logging.info(f"Read {len(therapist_names)} therapists from table '{table_name}'")
         
     except Exception as e:
         logging.error(f"Error reading table '{table_name}': {str(e)}")
-    
-    return result
 
 
-def process_dashboard_sheet(ws, team_name, table_config):
-    """Extract all KPI data from one dashboard sheet."""
-    logging.info(f"Processing sheet '{ws.title}' for team '{team_name}'")
-    
-    kpi_data = {}
-    for table_name, kpi_column_name in table_config.items():
-        table_data = read_table_data(ws, table_name, kpi_column_name)
-        kpi_data[kpi_column_name] = table_data
-    
-    therapist_data = {}
+def build_monthly_records(ws, team_name, table_config, table_refs=None, months=MONTH_COLUMNS):
+    """
+    Extract all KPI data from one dashboard sheet as flat monthly records.
     
-    all_therapists = set()
-    for kpi_name, therapist_dict in kpi_data.items():
-        all_therapists.update(therapist_dict.keys())
+    Records are keyed by (name, month) and filled in place as each table is
+    read - one record per therapist per month, every KPI defaulting to None
+    (including KPIs whose table is missing from the sheet).
+    """
+    logging.info(f"Processing sheet '{ws.title}' for team '{team_name}'")
     
-    for therapist_name in all_therapists:
-        therapist_data[therapist_name] = {}
-        
-        for month in MONTH_COLUMNS:
-            therapist_data[therapist_name][month] = {}
-            
-            for kpi_name, therapist_dict in kpi_data.items():
-                if therapist_name in therapist_dict and month in therapist_dict[therapist_name]:
-                    value = therapist_dict[therapist_name][month]
-                    therapist_data[therapist_name][month][kpi_name] = value
-                else:
-                    therapist_data[therapist_name][month][kpi_name] = None
+    # Every record has the same keys - copying a pre-sized template skips the
+    # per-record fromkeys/update and any dict resizing
+    record_template = dict.fromkeys(['Name', 'Month', *table_config.values()])
+    records_by_name_month = {}
     
-    logging.info(f"Processed {len(therapist_data)} therapists from '{ws.title}'")
-    return therapist_data
-
-
-def transform_to_monthly_records(therapist_data, team_name):
-    """Transform therapist-centric data into monthly records."""
-    records = []
-    
-    for therapist_name, months_data in therapist_data.items():
-        for month, kpi_values in months_data.items():
-            record = {
-                'Name': therapist_name,
-                'Month': month
-            }
-            record.update(kpi_values)
-            records.append(record)
+    for table_name, kpi_column_name in table_config.items():
+        read_table_into(ws, table_name, kpi_column_name, records_by_name_month, record_template, table_refs,
+                        months)
     
-    logging.info(f"Transformed {len(records)} monthly records for team '{team_name}'")
+    records = list(records_by_name_month.values())
+    logging.info(f"Built {len(records)} monthly records for team '{team_name}' from '{ws.title}'")
     return records
 
 
-def load_kpi_dashboard_data(wb):
-    """Load KPI data from Team Leader Dashboard tables."""
+def load_kpi_dashboard_data(wb, table_refs=None, sheet_config=SHEET_CONFIG, months=MONTH_COLUMNS):
+    """
+    Load KPI data from Team Leader Dashboard tables.
+    
+    Pass table_refs (from read_table_refs) when wb was opened read-only.
+    sheet_config and months default to the sync's own dashboard layout.
+    """
     logging.info("Loading KPI data from Dashboard tables...")
     
     master_data = {}
     
-    for sheet_name, config in SHEET_CONFIG.items():
+    for sheet_name, config in sheet_config.items():
         team_name = config['team_name']
         table_config = config['tables']
         
@@ -635,8 +1228,7 @@ def load_kpi_dashboard_data(wb):
             continue
         
         ws = wb[sheet_name]
-        therapist_data = process_dashboard_sheet(ws, team_name, table_config)
-        records = transform_to_monthly_records(therapist_data, team_name)
+        records = build_monthly_records(ws, team_name, table_config, table_refs, months)
         master_data[team_name] = records
     
     total_records = sum(len(records) for records in master_data.values())
@@ -647,6 +1239,28 @@ def load_kpi_dashboard_data(wb):
     return master_data
 
 
+def index_master_data(master_data):
+    """
+    Group master data records by therapist for O(1) per-therapist lookups.
+    
+    Records are listed under their Name and, when different, their
+    UniqueTeamMembers value, in their original order.
+    
+    Returns:
+        dict: {team_name: {therapist_name: [records]}}
+    """
+    kpi_index = {}
+    for team_name, records in master_data.items():
+        by_name = kpi_index[team_name] = {}
+        for record in records:
+            name = record.get('Name')
+            by_name.setdefault(name, []).append(record)
+            alias = record.get('UniqueTeamMembers')
+            if alias is not None and alias != name:
+                by_name.setdefault(alias, []).append(record)
+    return kpi_index
+
+
 # =============================================================================
 # MAIN PROCESSING FUNCTIONS
 # =============================================================================
@@ -665,7 +1279,7 @@ def process_kpi_sync(process_individual=True, process_team_leader=True, therapis
     """
     # Import supporting modules
     from individual_sheet_v2 import update_individual_sheet
-    from team_table_sync import sync_all_team_tables
+    from team_table_sync import sync_all_team_tables, wait_for_email
     from team_leader_formatting import format_all_team_leader_sheets
     
     stats = {
@@ -673,6 +1287,7 @@ def process_kpi_sync(process_individual=True, process_team_leader=True, therapis
         'individual': {'success': 0, 'failed': 0, 'skipped': 0},
         'team_leader': {'synced': False, 'formatted': False}
     }
+    email_future = None
     
     try:
         # Get authentication token
@@ -693,17 +1308,31 @@ def process_kpi_sync(process_individual=True, process_team_leader=True, therapis
         
         logging.info(f"Config loaded: {len(active_therapists)} active therapists")
         
+        # Resolve every file the individual updates touch in batched Graph calls up front
+        # (a Team Leader-only run resolves its single file directly)
+        if process_individual:
+            resolve_file_paths_batch(
+                [TEAM_LEADER_FILE_PATH, *TEMPLATE_PATHS.values()]
+                + [t['FilePath'] for t in active_therapists if t.get('FilePath')],
+                token
+            )
+        
         # Load master data from Team Leader file
         logging.info("Loading master KPI data from Team Leader file...")
         file_id = resolve_file_path(TEAM_LEADER_FILE_PATH, token)
         if not file_id:
             raise Exception(f"Team Leader file not found: {TEAM_LEADER_FILE_PATH}")
         
-        file_content = download_excel_file(file_id, token)
-        wb = load_workbook(file_content, data_only=True)
-        master_data = load_kpi_dashboard_data(wb)
+        # Keep the raw bytes - the same download is reopened for the Team Leader update
+        with download_excel_file(file_id, token) as file_content:
+            team_leader_bytes = file_content.read()
+        table_refs = read_table_refs(BytesIO(team_leader_bytes))
+        wb = load_workbook(BytesIO(team_leader_bytes), data_only=True, read_only=True, keep_links=False)
+        master_data = load_kpi_dashboard_data(wb, table_refs)
         wb.close()
         
+        kpi_index = index_master_data(master_data)
+        
         total_records = sum(len(records) for records in master_data.values())
         logging.info(f"Master data loaded: {total_records} records")
         
@@ -715,37 +1344,46 @@ def process_kpi_sync(process_individual=True, process_team_leader=True, therapis
         if process_individual:
             logging.info("Processing individual therapist sheets...")
             
-            for i, therapist in enumerate(active_therapists, 1):
+            # Templates for newly created files are downloaded at most once per run
+            template_cache = {}
+            
+            def process_one(index, therapist):
+                """Update one therapist's sheet; returns 'success' | 'failed' | 'skipped'."""
                 name = therapist.get('Name', 'Unknown')
                 file_path = therapist.get('FilePath', '')
                 
-                logging.info(f"[{i}/{len(active_therapists)}] Processing {name}")
+                logging.info(f"[{index}/{len(active_therapists)}] Processing {name}")
                 
                 if not file_path:
                     logging.warning(f"No FilePath for {name} - skipping")
-                    stats['individual']['skipped'] += 1
-                    continue
+                    return 'skipped'
                 
                 try:
-                    result = update_individual_sheet(therapist, config, master_data, token, year)
-                    if result:
-                        stats['individual']['success'] += 1
-                    else:
-                        stats['individual']['failed'] += 1
+                    result = update_individual_sheet(therapist, config, master_data, token, year, kpi_index,
+                                                     template_cache)
+                    return 'success' if result else 'failed'
                 except Exception as e:
                     logging.error(f"Error processing {name}: {e}")
-                    stats['individual']['failed'] += 1
+                    return 'failed'
+            
+            if active_therapists:
+                max_workers = min(INDIVIDUAL_MAX_WORKERS, len(active_therapists))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    outcomes = list(executor.map(process_one, range(1, len(active_therapists) + 1), active_therapists))
+                
+                for outcome in outcomes:
+                    stats['individual'][outcome] += 1
         
         # Process Team Leader file
         if process_team_leader:
             logging.info("Processing Team Leader file...")
             
-            # Download fresh copy
-            file_content = download_excel_file(file_id, token)
-            wb = load_workbook(file_content)
+            # Reopen the bytes downloaded above in full (formula-preserving) mode
+            wb = load_workbook(BytesIO(team_leader_bytes))
             
             # Sync tables
             sync_stats = sync_all_team_tables(wb, config, token)
+            email_future = sync_stats['email']
             stats['team_leader']['synced'] = True
             logging.info(f"Sync complete: {sync_stats['tables']} tables")
             
@@ -755,12 +1393,10 @@ def process_kpi_sync(process_individual=True, process_team_leader=True, therapis
             logging.info(f"Formatting complete: {format_stats['rows_formatted']} rows")
             
             # Upload
-            output = BytesIO()
-            wb.save(output)
-            output.seek(0)
-            wb.close()
-            
-            upload_excel_file(TEAM_LEADER_FILE_PATH, output, token)
+            with SpooledTemporaryFile(max_size=SAVE_SPOOL_MAX_SIZE) as output:
+                wb.save(output)
+                wb.close()
+                upload_excel_file(TEAM_LEADER_FILE_PATH, output, token)
             logging.info("Team Leader file uploaded successfully")
         
         logging.info("KPI sync completed successfully")
@@ -769,6 +1405,10 @@ def process_kpi_sync(process_individual=True, process_team_leader=True, therapis
         logging.error(f"KPI sync failed: {str(e)}")
         stats['status'] = 'error'
         stats['error'] = str(e)
+    finally:
+        # Any row-change notification was sent alongside formatting/upload -
+        # wait for it even if they failed
+        wait_for_email(email_future, EMAIL_FLUSH_TIMEOUT)
     
     return stats
 
@@ -801,6 +1441,24 @@ def kpi_sync_timer(mytimer: func.TimerRequest) -> None:
         raise
 
 
+def bool_param(params, key, default):
+    """
+    Read a true/false flag from query params or a JSON body.
+    
+    Args:
+        params: Mapping to read from (req.params or the parsed body)
+        key: Parameter name
+        default: Value to use when the parameter is absent or empty
+    
+    Returns:
+        bool
+    """
+    value = params.get(key)
+    if value is None or value == '':
+        return default
+    return parse_bool(value)
+
+
 @app.route(route="kpi_sync", methods=["POST", "GET"], auth_level=func.AuthLevel.FUNCTION)
 def kpi_sync_http(req: func.HttpRequest) -> func.HttpResponse:
     """
@@ -823,25 +1481,24 @@ def kpi_sync_http(req: func.HttpRequest) -> func.HttpResponse:
     therapist_filter = None
     
     # Try to get from query params first
-    if req.params.get('process_individual'):
-        process_individual = req.params.get('process_individual', '').lower() == 'true'
-    if req.params.get('process_team_leader'):
-        process_team_leader = req.params.get('process_team_leader', '').lower() == 'true'
-    if req.params.get('therapist'):
-        therapist_filter = req.params.get('therapist')
-    
-    # Try to get from JSON body
+    params = req.params
+    process_individual = bool_param(params, 'process_individual', process_individual)
+    process_team_leader = bool_param(params, 'process_team_leader', process_team_leader)
+    therapist_filter = params.get('therapist') or therapist_filter
+    
+    # Then from the JSON body, if one was sent (GETs usually have none)
+    body = req.get_body()
     try:
-        req_body = req.get_json()
-        if req_body:
-            if 'process_individual' in req_body:
-                process_individual = req_body['process_individual']
-            if 'process_team_leader' in req_body:
-                process_team_leader = req_body['process_team_leader']
-            if 'therapist' in req_body:
-                therapist_filter = req_body['therapist']
+        req_body = json.loads(body) if body else None
     except ValueError:
-        pass  # No JSON body, use query params
+        logging.warning("Ignoring request body that is not valid JSON")
+        req_body = None
+    
+    if req_body and isinstance(req_body, dict):
+        process_individual = bool_param(req_body, 'process_individual', process_individual)
+        process_team_leader = bool_param(req_body, 'process_team_leader', process_team_leader)
+        if 'therapist' in req_body:
+            therapist_filter = req_body['therapist']
     
     try:
         stats = process_kpi_sync(
@@ -8,12 +8,33 @@ for use with the redesigned templates where months are columns instead of rows.
 
 import logging
 import re
+import zipfile
+from bisect import bisect_right
 from datetime import date
+from functools import lru_cache, partial
 from io import BytesIO
+from tempfile import SpooledTemporaryFile
 from openpyxl import load_workbook
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.formatting.rule import CellIsRule, FormulaRule
+from openpyxl.formatting.formatting import ConditionalFormatting, ConditionalFormattingList
 from openpyxl.utils import get_column_letter
+from openpyxl.xml import LXML
+from xml.sax.saxutils import escape
+
+# Graph and shared .xlsx helpers, resolved once at import. The Graph module is
+# kept (not its functions) so they are looked up at call time.
+try:
+    import function_app as graph_api
+    from function_app import month_midpoints, read_sheet_parts
+except ImportError:
+    import function_app_local as graph_api
+    from function_app_local import month_midpoints, read_sheet_parts
+
+# openpyxl serialises workbooks through lxml when it is importable - roughly
+# twice as fast as the stdlib writer on wb.save()
+if not LXML:
+    logging.warning("lxml not installed - workbook saves use the slower stdlib XML writer")
 
 # =============================================================================
 # CONFIGURATION - NEW TEMPLATE LAYOUT
@@ -35,6 +56,9 @@ MONTH_COLUMNS = {
     'Dec': 14, 'December': 14  # Column N
 }
 
+# Case-insensitive view of MONTH_COLUMNS ('jan', 'january', 'sept', ...)
+MONTH_COLUMN_BY_KEY = {month.lower(): col for month, col in MONTH_COLUMNS.items()}
+
 # KPI to Row mapping - Physio (NEW - KPIs are rows)
 KPI_ROWS_PHYSIO = {
     'BillingsKPI': 4,
@@ -53,6 +77,12 @@ KPI_ROWS_OT = {
     'Attitude': 8
 }
 
+# Rows formatted on the 1-5 rating scale (everything after the numeric KPIs)
+RATING_ROWS = {
+    'Physio': (6, 7, 8),
+    'OT': (5, 6, 7, 8)
+}
+
 # Threshold display locations in new template
 THRESHOLD_ROWS = {
     'billings': {
@@ -67,6 +97,9 @@ THRESHOLD_ROWS = {
     }
 }
 
+# Saved workbooks are buffered in memory up to this size, then on disk until uploaded
+SAVE_SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
 # Data range for conditional formatting (C-O = columns 3-15, includes Average)
 DATA_START_COL = 3   # Column C
 DATA_END_COL = 15    # Column O (Average)
@@ -80,11 +113,10 @@ DEFAULT_COLORS = {
     'white': 'FFFFFFFF'
 }
 
-# Month name to number mapping for competency history
-MONTH_NAME_TO_NUM = {
-    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'June': 6,
-    'July': 7, 'Aug': 8, 'Sept': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
-}
+# Month name to number mapping for competency history - same spellings as
+# MONTH_COLUMNS (month columns start at C, so number = column - 2); use
+# month_column() for case-insensitive lookups
+MONTH_NAME_TO_NUM = {month: col - 2 for month, col in MONTH_COLUMNS.items()}
 
 # Reverse mapping: column number to month name
 COL_TO_MONTH = {
@@ -92,6 +124,51 @@ COL_TO_MONTH = {
     9: 'July', 10: 'Aug', 11: 'Sept', 12: 'Oct', 13: 'Nov', 14: 'Dec'
 }
 
+# Column letters for columns 1-20 (COL_LETTERS[col - 1]); the sheet only uses A-O
+COL_LETTERS = tuple(get_column_letter(col) for col in range(1, 21))
+
+# Per-row month+Average range (C:O) and blank-cell CF formula, rows 3-19
+ROW_RANGES = {row: f'C{row}:O{row}' for row in range(3, 20)}
+BLANK_FORMULAS = {row: f'=LEN(TRIM(C{row}))=0' for row in range(3, 20)}
+
+# Cell styles for the KPI data block, shared by every sheet update
+CENTER_ALIGN = Alignment(horizontal='center', vertical='center')
+BLACK_FONT = Font(color='000000')
+
+
+def month_column(month):
+    """Column for a record's month in any supported spelling or case, or None (e.g. 'Average')."""
+    if not isinstance(month, str):
+        return None
+    return MONTH_COLUMN_BY_KEY.get(month.strip().lower())
+
+
+@lru_cache(maxsize=None)
+def solid_fill(color):
+    """Solid PatternFill for an ARGB colour - built once per colour and shared by all sheets."""
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def get_fill(colours, name):
+    """Cached fill for a named colour ('red', 'green', ...), falling back to DEFAULT_COLORS."""
+    return solid_fill(colours.get(name, DEFAULT_COLORS[name]))
+
+
+def therapist_index(config):
+    """
+    Config_Therapists rows keyed by normalised name (first row wins).
+    
+    load_config builds this as config['_therapist_by_name']; for configs
+    assembled elsewhere it is built here once and stored the same way.
+    """
+    therapist_by_name = config.get('_therapist_by_name')
+    if therapist_by_name is None:
+        therapist_by_name = {}
+        for therapist in config.get('therapists', []):
+            therapist_by_name.setdefault(str(therapist.get('Name') or '').strip().lower(), therapist)
+        config['_therapist_by_name'] = therapist_by_name
+    return therapist_by_name
+
 
 def get_competency_for_month(therapist_name, month_name, year, config):
     """
@@ -99,27 +176,34 @@ def get_competency_for_month(therapist_name, month_name, year, config):
     
     Args:
         therapist_name: Name of the therapist
-        month_name: Month name ('Jan', 'Feb', etc.)
+        month_name: Month name ('Jan', 'feb', 'September', etc. - any case)
         year: Year (e.g., 2026)
         config: Config dict containing 'competency_history' and 'therapists'
         
     Returns:
         str: Competency level ('Grad', 'CA', 'Senior') or None if not found
     """
-    month_num = MONTH_NAME_TO_NUM.get(month_name)
-    if not month_num:
+    col = month_column(month_name)
+    if not col:
         return None
     
-    target_date = date(year, month_num, 15)
-    
-    history = config.get('competency_history', [])
-    therapist_records = [
-        r for r in history 
-        if r.get('Name', '').strip().lower() == therapist_name.strip().lower()
-    ]
-    
-    if therapist_records:
-        therapist_records.sort(key=lambda r: r.get('EffectiveDate', date.min), reverse=True)
+    target_date = month_midpoints(year)[col - 3]
+    key = therapist_name.strip().lower()
+    
+    # Prefer the name indexes built by load_config (bisect over sorted dates);
+    # scan the lists otherwise
+    by_name = config.get('_competency_by_name')
+    dates_by_name = config.get('_competency_dates_by_name')
+    if by_name is not None and dates_by_name is not None:
+        idx = bisect_right(dates_by_name.get(key, ()), target_date) - 1
+        if idx >= 0:
+            return by_name[key][idx].get('Competency')
+    else:
+        therapist_records = sorted(
+            (r for r in config.get('competency_history', [])
+             if r.get('Name', '').strip().lower() == key),
+            key=lambda r: r.get('EffectiveDate', date.min), reverse=True
+        )
         
         for record in therapist_records:
             effective_date = record.get('EffectiveDate')
@@ -127,145 +211,147 @@ def get_competency_for_month(therapist_name, month_name, year, config):
                 return record.get('Competency')
     
     # Fall back to current competency from Config_Therapists
-    for therapist in config.get('therapists', []):
-        if therapist.get('Name', '').strip().lower() == therapist_name.strip().lower():
-            return therapist.get('Competency')
+    therapist = therapist_index(config).get(key)
+    return therapist.get('Competency') if therapist else None
+
+
+def first_effective_month(eff_date, year):
+    """
+    First month of `year` whose mid-month date (the 15th) is on or after eff_date.
     
-    return None
+    Returns:
+        int: 1-12, or 13 when the date falls after 15 December of that year
+    """
+    if eff_date.year != year:
+        return 1 if eff_date.year < year else 13
+    return eff_date.month if eff_date.day <= 15 else eff_date.month + 1
 
 
 def get_competency_ranges_for_therapist(therapist_name, year, config):
     """
     Get column ranges for each competency period for a therapist.
     
+    Results are memoised on the config itself (config['_competency_ranges_cache'])
+    keyed by normalised name and year, so they live exactly as long as the
+    loaded config - a reload starts a fresh cache.
+    
     Returns list of tuples: [(competency, start_col, end_col), ...]
     
     Example for Chris (CA Jan, Senior from Feb):
     [('CA', 3, 3), ('Senior', 4, 15)]  # C for Jan, D-O for Feb-Dec+Avg
     """
-    logging.info(f"  [DEBUG] get_competency_ranges called: name='{therapist_name}', year={year}")
-    
-    history = config.get('competency_history', [])
-    logging.info(f"  [DEBUG] Total competency_history records: {len(history)}")
-    
-    therapist_records = [
-        r for r in history
-        if r.get('Name', '').strip().lower() == therapist_name.strip().lower()
-        and r.get('EffectiveDate')
-    ]
-    
-    logging.info(f"  [DEBUG] Records matching '{therapist_name}': {len(therapist_records)}")
-    for r in therapist_records:
-        logging.info(f"  [DEBUG]   Record: Name='{r.get('Name')}', Comp='{r.get('Competency')}', Date={r.get('EffectiveDate')} (type={type(r.get('EffectiveDate')).__name__})")
+    cache = config.setdefault('_competency_ranges_cache', {})
+    key = therapist_name.strip().lower()
+    if (key, year) not in cache:
+        cache[key, year] = compute_competency_ranges(therapist_name, year, config, key=key)
+    return cache[key, year]
+
+
+def compute_competency_ranges(therapist_name, year, config, key=None):
+    """Uncached worker for get_competency_ranges_for_therapist (key: pre-normalised name)."""
+    # load_config's indexes are already sorted oldest first (dated records only,
+    # dates pre-normalised); scan the list otherwise
+    if key is None:
+        key = therapist_name.strip().lower()
+    by_name = config.get('_competency_by_name')
+    dates_by_name = config.get('_competency_dates_by_name')
+    effective_dates = None
+    if by_name is not None:
+        therapist_records = by_name.get(key, [])
+        if dates_by_name is not None:
+            effective_dates = dates_by_name.get(key, [])
+    else:
+        therapist_records = sorted(
+            (r for r in config.get('competency_history', [])
+             if r.get('Name', '').strip().lower() == key
+             and r.get('EffectiveDate')),
+            key=lambda r: r.get('EffectiveDate')
+        )
     
     if not therapist_records or not year:
-        logging.info(f"  [DEBUG] Early return None: records={len(therapist_records) if therapist_records else 0}, year={year}")
         return None
     
-    therapist_records.sort(key=lambda r: r.get('EffectiveDate'))
-    
-    # Determine competency for each month column (3-14 = Jan-Dec)
-    month_competencies = {}
-    for col in range(3, 15):  # C to N (Jan to Dec)
-        month_name = COL_TO_MONTH.get(col)
-        if not month_name:
-            logging.info(f"  [DEBUG] col {col}: no month_name in COL_TO_MONTH")
-            continue
-        
-        month_num = MONTH_NAME_TO_NUM.get(month_name)
-        if not month_num:
-            logging.info(f"  [DEBUG] col {col}, month '{month_name}': no month_num in MONTH_NAME_TO_NUM")
-            continue
-        
-        target_date = date(year, month_num, 15)
-        
-        applicable_comp = None
+    if effective_dates is None:
+        effective_dates = []
         for record in therapist_records:
             eff_date = record.get('EffectiveDate')
-            if hasattr(eff_date, 'date'):
-                eff_date = eff_date.date()
-            if eff_date <= target_date:
-                applicable_comp = record.get('Competency')
-        
-        if applicable_comp:
-            month_competencies[col] = applicable_comp
-    
-    logging.info(f"  [DEBUG] month_competencies: {month_competencies}")
+            effective_dates.append(eff_date.date() if hasattr(eff_date, 'date') else eff_date)
     
-    if not month_competencies:
-        logging.info(f"  [DEBUG] No month_competencies, returning None")
-        return None
+    # Each record covers the months from its first effective month up to the
+    # month before the next record takes over; walk them once, merging
+    # neighbours that share a competency (columns 3-14 = Jan-Dec)
+    starts = [first_effective_month(eff_date, year) for eff_date in effective_dates]
+    starts.append(13)
     
-    # Group consecutive columns with same competency into ranges
     ranges = []
-    current_comp = None
-    range_start_col = None
-    range_end_col = None
-    
-    for col in range(3, 15):  # C to N
-        if col not in month_competencies:
-            continue
-        comp = month_competencies[col]
+    for i, record in enumerate(therapist_records):
+        start_month, end_month = starts[i], starts[i + 1] - 1
+        comp = record.get('Competency')
+        if start_month > end_month or not comp:
+            continue  # superseded before taking effect, or no competency given
         
-        if comp == current_comp:
-            range_end_col = col
+        start_col, end_col = start_month + 2, end_month + 2
+        if ranges and ranges[-1][0] == comp:
+            ranges[-1] = (comp, ranges[-1][1], end_col)
         else:
-            if current_comp is not None:
-                ranges.append((current_comp, range_start_col, range_end_col))
-            current_comp = comp
-            range_start_col = col
-            range_end_col = col
+            ranges.append((comp, start_col, end_col))
     
-    # Don't forget the last range
-    if current_comp is not None:
-        ranges.append((current_comp, range_start_col, range_end_col))
+    if not ranges:
+        return None
     
     # Add Average column (15) to the last competency's range
-    if ranges:
-        last_comp, last_start, last_end = ranges[-1]
-        ranges[-1] = (last_comp, last_start, 15)  # Extend to column O (Average)
+    last_comp, last_start, last_end = ranges[-1]
+    ranges[-1] = (last_comp, last_start, 15)  # Extend to column O (Average)
     
-    logging.info(f"  [DEBUG] Final ranges: {ranges}, len={len(ranges)}")
-    result = ranges if len(ranges) > 1 else None
-    logging.info(f"  [DEBUG] Returning: {result}")
-    
-    return result
+    logging.debug(f"{therapist_name} {year}: competency ranges {ranges}")
+    return ranges if len(ranges) > 1 else None  # Only return if there are multiple ranges
 
 
-def apply_billing_formatting_with_history(ws, therapist_name, year, config, thresholds_all, colours, kpi_row=4):
+def billing_rules_with_history(therapist_name, year, config, thresholds_all, colours, kpi_row=4):
     """
-    Apply billing formatting with competency history support.
+    Build billing formatting rules with competency history support.
     
     If therapist has competency changes during the year, applies different
     thresholds to different column ranges.
     
     Args:
-        ws: Worksheet
         therapist_name: Name of therapist
         year: Year for competency lookup
         config: Full config dict
         thresholds_all: All thresholds for team type (e.g., config['thresholds']['Physio'])
         colours: Color config dict
         kpi_row: Row number for BillingsKPI (default 4)
+        
+    Returns:
+        list: [(cell_range, rule), ...]
     """
-    # Check for competency history
-    comp_ranges = get_competency_ranges_for_therapist(therapist_name, year, config)
-    
-    red_color = colours.get('red', DEFAULT_COLORS['red'])
-    green_color = colours.get('green', DEFAULT_COLORS['green'])
-    blue_color = colours.get('blue', DEFAULT_COLORS['blue'])
-    white_color = colours.get('white', DEFAULT_COLORS['white'])
+    rules = []
+    
+    # Check for competency history - load_config's index has no entry for
+    # therapists without dated history, so most sheets skip the lookup
+    key = therapist_name.strip().lower()
+    by_name = config.get('_competency_by_name')
+    if by_name is not None and key not in by_name:
+        comp_ranges = None
+    else:
+        comp_ranges = get_competency_ranges_for_therapist(therapist_name, year, config)
     
-    red_fill = PatternFill(start_color=red_color, end_color=red_color, fill_type='solid')
-    green_fill = PatternFill(start_color=green_color, end_color=green_color, fill_type='solid')
-    blue_fill = PatternFill(start_color=blue_color, end_color=blue_color, fill_type='solid')
-    white_fill = PatternFill(start_color=white_color, end_color=white_color, fill_type='solid')
+    red_fill = get_fill(colours, 'red')
+    green_fill = get_fill(colours, 'green')
+    blue_fill = get_fill(colours, 'blue')
+    white_fill = get_fill(colours, 'white')
     
     if comp_ranges:
         # Apply different thresholds to different column ranges
         logging.info(f"  {therapist_name}: {len(comp_ranges)} competency ranges")
         
+        # Same competency twice in a year (e.g. CA -> Senior -> CA) shares one
+        # multi-range sqref and one set of rules
+        cols_by_comp = {}
         for competency, start_col, end_col in comp_ranges:
+            cols_by_comp.setdefault(competency, []).append((start_col, end_col))
+        
+        for competency, col_spans in cols_by_comp.items():
             thresholds = thresholds_all.get(competency, {})
             if not thresholds:
                 logging.warning(f"No thresholds for competency {competency}")
@@ -274,50 +360,51 @@ def apply_billing_formatting_with_history(ws, therapist_name, year, config, thre
             green_min = thresholds.get('green_min', 0)
             blue_above = thresholds.get('blue_above', 100)
             
-            start_letter = get_column_letter(start_col)
-            end_letter = get_column_letter(end_col)
-            cell_range = f'{start_letter}{kpi_row}:{end_letter}{kpi_row}'
+            spans = [(COL_LETTERS[start_col - 1], COL_LETTERS[end_col - 1])
+                     for start_col, end_col in col_spans]
+            cell_range = ' '.join(f'{start}{kpi_row}:{end}{kpi_row}' for start, end in spans)
+            # Relative formula references resolve from the first range's top-left cell
+            first_letter = spans[0][0]
             
             # Apply formatting rules
-            ws.conditional_formatting.add(cell_range,
-                FormulaRule(formula=[f'=LEN(TRIM({start_letter}{kpi_row}))=0'], fill=white_fill))
-            ws.conditional_formatting.add(cell_range,
-                CellIsRule(operator='greaterThan', formula=[str(blue_above)], fill=blue_fill))
-            ws.conditional_formatting.add(cell_range,
-                CellIsRule(operator='greaterThanOrEqual', formula=[str(green_min)], fill=green_fill))
-            ws.conditional_formatting.add(cell_range,
-                CellIsRule(operator='lessThan', formula=[str(green_min)], fill=red_fill))
+            rules.append((cell_range,
+                FormulaRule(formula=[f'=LEN(TRIM({first_letter}{kpi_row}))=0'], fill=white_fill)))
+            rules.append((cell_range,
+                CellIsRule(operator='greaterThan', formula=[str(blue_above)], fill=blue_fill)))
+            rules.append((cell_range,
+                CellIsRule(operator='greaterThanOrEqual', formula=[str(green_min)], fill=green_fill)))
+            rules.append((cell_range,
+                CellIsRule(operator='lessThan', formula=[str(green_min)], fill=red_fill)))
             
-            logging.info(f"    {competency}: cols {start_letter}-{end_letter}, green>={green_min}, blue>{blue_above}")
+            logging.info(f"    {competency}: {cell_range}, green>={green_min}, blue>{blue_above}")
     else:
         # No history - use standard single-range formatting with current competency
-        # Get current competency from therapists list
-        current_comp = None
-        for t in config.get('therapists', []):
-            if t.get('Name', '').strip().lower() == therapist_name.strip().lower():
-                current_comp = t.get('Competency', 'CA')
-                break
+        # Get current competency from the therapists name index
+        therapist = therapist_index(config).get(key)
+        current_comp = therapist.get('Competency', 'CA') if therapist else None
         
         thresholds = thresholds_all.get(current_comp, {})
         if not thresholds:
             logging.warning(f"No thresholds for {therapist_name} competency {current_comp}")
-            return
+            return rules
         
         green_min = thresholds.get('green_min', 0)
         blue_above = thresholds.get('blue_above', 100)
         
         logging.info(f"Billing thresholds: green>={green_min}, blue>{blue_above}")
         
-        billing_range = f'C{kpi_row}:O{kpi_row}'
+        billing_range = ROW_RANGES[kpi_row]
         
-        ws.conditional_formatting.add(billing_range,
-            FormulaRule(formula=[f'=LEN(TRIM(C{kpi_row}))=0'], fill=white_fill))
-        ws.conditional_formatting.add(billing_range,
-            CellIsRule(operator='greaterThan', formula=[str(blue_above)], fill=blue_fill))
-        ws.conditional_formatting.add(billing_range,
-            CellIsRule(operator='greaterThanOrEqual', formula=[str(green_min)], fill=green_fill))
-        ws.conditional_formatting.add(billing_range,
-            CellIsRule(operator='lessThan', formula=[str(green_min)], fill=red_fill))
+        rules.append((billing_range,
+            FormulaRule(formula=[BLANK_FORMULAS[kpi_row]], fill=white_fill)))
+        rules.append((billing_range,
+            CellIsRule(operator='greaterThan', formula=[str(blue_above)], fill=blue_fill)))
+        rules.append((billing_range,
+            CellIsRule(operator='greaterThanOrEqual', formula=[str(green_min)], fill=green_fill)))
+        rules.append((billing_range,
+            CellIsRule(operator='lessThan', formula=[str(green_min)], fill=red_fill)))
+    
+    return rules
 
 
 # =============================================================================
@@ -325,7 +412,8 @@ def apply_billing_formatting_with_history(ws, therapist_name, year, config, thre
 # =============================================================================
 
 def create_from_template_v2(therapist, config, token,
-                            resolve_file_path, download_excel_file, upload_excel_file):
+                            resolve_file_path, download_excel_file, upload_excel_file,
+                            template_cache=None):
     """
     Create new therapist file from template - NEW LAYOUT.
     
@@ -340,6 +428,8 @@ def create_from_template_v2(therapist, config, token,
         resolve_file_path: Function to resolve SharePoint paths
         download_excel_file: Function to download Excel files
         upload_excel_file: Function to upload Excel files
+        template_cache: Optional {template_path: bytes} shared by the files
+            created in one sync run (None = download the template every time)
         
     Returns:
         bool: Success/failure
@@ -355,15 +445,32 @@ def create_from_template_v2(therapist, config, token,
     # Template path
     template_path = f"/Excel files/KPI Files/KPI/templates/Template_{team_type}.xlsx"
     
-    # Download template
-    template_file_id = resolve_file_path(template_path, token)
-    if not template_file_id:
-        logging.error(f"Template not found: {template_path}")
-        return False
+    # Templates are downloaded once per sync run and shared by every new file
+    # (and worker thread) in it
+    if template_cache is None:
+        template_cache = {}
+    template_bytes = template_cache.get(template_path)
+    if template_bytes is None:
+        template_file_id = resolve_file_path(template_path, token)
+        if not template_file_id:
+            logging.error(f"Template not found: {template_path}")
+            return False
     
     try:
-        template_content = download_excel_file(template_file_id, token)
-        wb = load_workbook(template_content)
+        if template_bytes is None:
+            with download_excel_file(template_file_id, token) as source:
+                template_bytes = source.read()
+            template_cache[template_path] = template_bytes
+        
+        # Fast path: copy the template archive and rewrite just the two cells
+        with SpooledTemporaryFile(max_size=SAVE_SPOOL_MAX_SIZE) as output:
+            if stamp_template(BytesIO(template_bytes), {'B2': name, 'D2': competency}, output):
+                upload_excel_file(file_path, output, token)
+                logging.info(f"Created new file for {name} at {file_path}")
+                return True
+        
+        # Template layout not recognised - fall back to a full openpyxl round trip
+        wb = load_workbook(BytesIO(template_bytes))
         
         # Find Dashboard sheet
         dashboard_sheet = None
@@ -385,13 +492,11 @@ def create_from_template_v2(therapist, config, token,
         # Write competency to D2 (NEW)
         ws.cell(row=2, column=4, value=competency)
         
-        # Save to BytesIO
-        output = BytesIO()
-        wb.save(output)
-        wb.close()
-        
-        # Upload as new file
-        upload_excel_file(file_path, output, token)
+        # Save to a spooled buffer and upload as new file
+        with SpooledTemporaryFile(max_size=SAVE_SPOOL_MAX_SIZE) as output:
+            wb.save(output)
+            wb.close()
+            upload_excel_file(file_path, output, token)
         logging.info(f"Created new file for {name} at {file_path}")
         return True
         
@@ -400,25 +505,88 @@ def create_from_template_v2(therapist, config, token,
         return False
 
 
+def find_dashboard_part(archive):
+    """Zip path of the template's Dashboard sheet XML (first '*Dashboard*' sheet without 'KPI'), or None."""
+    for sheet_name, sheet_part in read_sheet_parts(archive).items():
+        if 'Dashboard' in sheet_name and 'KPI' not in sheet_name:
+            return sheet_part
+    return None
+
+
+def stamp_inline_string(sheet_xml, cell_ref, value):
+    """
+    Overwrite an existing <c> element in sheet XML with an inline string, keeping its style.
+    
+    Returns:
+        str: Updated sheet XML, or None if the cell is not present in the XML
+    """
+    match = re.search(rf'<c r="{cell_ref}"(?P<attrs>[^>]*?)(?:/>|>.*?</c>)', sheet_xml, re.S)
+    if not match:
+        return None
+    style = re.search(r'\ss="\d+"', match.group('attrs'))
+    cell = (f'<c r="{cell_ref}"{style.group(0) if style else ""} t="inlineStr">'
+            f'<is><t xml:space="preserve">{escape(str(value))}</t></is></c>')
+    return sheet_xml[:match.start()] + cell + sheet_xml[match.end():]
+
+
+def stamp_template(template_content, cells, output):
+    """
+    Write a copy of a template .xlsx into output with cells set on its Dashboard sheet.
+    
+    Every archive entry except the Dashboard sheet's XML is copied unchanged,
+    so the workbook is never parsed or re-serialised by openpyxl.
+    
+    Args:
+        template_content: Seekable file-like holding the template .xlsx
+        cells: {cell_ref: value} e.g. {'B2': 'Jane Smith'} - each cell must already exist
+        output: Writable file-like for the new .xlsx
+        
+    Returns:
+        bool: False (output untouched) if the sheet or any cell can't be found
+    """
+    with zipfile.ZipFile(template_content) as source:
+        sheet_part = find_dashboard_part(source)
+        if not sheet_part:
+            return False
+        
+        sheet_xml = source.read(sheet_part).decode('utf-8')
+        for cell_ref, value in cells.items():
+            sheet_xml = stamp_inline_string(sheet_xml, cell_ref, value)
+            if sheet_xml is None:
+                return False
+        
+        with zipfile.ZipFile(output, 'w') as target:
+            for item in source.infolist():
+                if item.filename == sheet_part:
+                    target.writestr(item, sheet_xml.encode('utf-8'))
+                else:
+                    target.writestr(item, source.read(item.filename))
+    return True
+
+
 # =============================================================================
 # CONDITIONAL FORMATTING FUNCTIONS - ROW-BASED
 # =============================================================================
 
-def apply_billing_formatting_v2(ws, thresholds, colours, kpi_row=4):
+def billing_rules_v2(thresholds, colours, kpi_row=4):
     """
-    Apply conditional formatting to billing KPI row.
+    Build conditional formatting rules for the billing KPI row.
     
     NEW: Applies to a single row (C4:O4) instead of a column.
     
     Args:
-        ws: Worksheet
         thresholds: Dict with red_below, green_min, green_max, blue_above
         colours: Color config dict
         kpi_row: Row number for BillingsKPI (default 4)
+        
+    Returns:
+        list: [(cell_range, rule), ...]
     """
+    rules = []
+    
     if not thresholds:
         logging.warning("No thresholds provided for billing formatting")
-        return
+        return rules
     
     # Get threshold values from config
     green_min = thresholds.get('green_min', 0)
@@ -426,110 +594,106 @@ def apply_billing_formatting_v2(ws, thresholds, colours, kpi_row=4):
     
     logging.info(f"Billing thresholds: green>={green_min}, blue>{blue_above}")
     
-    red_color = colours.get('red', DEFAULT_COLORS['red'])
-    green_color = colours.get('green', DEFAULT_COLORS['green'])
-    blue_color = colours.get('blue', DEFAULT_COLORS['blue'])
-    white_color = colours.get('white', DEFAULT_COLORS['white'])
-    
-    red_fill = PatternFill(start_color=red_color, end_color=red_color, fill_type='solid')
-    green_fill = PatternFill(start_color=green_color, end_color=green_color, fill_type='solid')
-    blue_fill = PatternFill(start_color=blue_color, end_color=blue_color, fill_type='solid')
-    white_fill = PatternFill(start_color=white_color, end_color=white_color, fill_type='solid')
+    red_fill = get_fill(colours, 'red')
+    green_fill = get_fill(colours, 'green')
+    blue_fill = get_fill(colours, 'blue')
+    white_fill = get_fill(colours, 'white')
     
     # Billing row range: C{row}:O{row} (includes Average column)
-    billing_range = f'C{kpi_row}:O{kpi_row}'
+    billing_range = ROW_RANGES[kpi_row]
     
     # 1. White for blank cells
-    ws.conditional_formatting.add(billing_range,
-        FormulaRule(formula=[f'=LEN(TRIM(C{kpi_row}))=0'], fill=white_fill))
+    rules.append((billing_range,
+        FormulaRule(formula=[BLANK_FORMULAS[kpi_row]], fill=white_fill)))
     
     # 2. Blue for > blue_above (excellent)
-    ws.conditional_formatting.add(billing_range,
-        CellIsRule(operator='greaterThan', formula=[str(blue_above)], fill=blue_fill))
+    rules.append((billing_range,
+        CellIsRule(operator='greaterThan', formula=[str(blue_above)], fill=blue_fill)))
     
     # 3. Green for >= green_min (meets threshold)
-    ws.conditional_formatting.add(billing_range,
-        CellIsRule(operator='greaterThanOrEqual', formula=[str(green_min)], fill=green_fill))
+    rules.append((billing_range,
+        CellIsRule(operator='greaterThanOrEqual', formula=[str(green_min)], fill=green_fill)))
     
     # 4. Red for < green_min (below threshold)
-    ws.conditional_formatting.add(billing_range,
-        CellIsRule(operator='lessThan', formula=[str(green_min)], fill=red_fill))
+    rules.append((billing_range,
+        CellIsRule(operator='lessThan', formula=[str(green_min)], fill=red_fill)))
+    
+    return rules
 
 
-def apply_ceased_services_formatting_v2(ws, ceased_thresholds, colours, kpi_row=5):
+def ceased_services_rules_v2(ceased_thresholds, colours, kpi_row=5):
     """
-    Apply conditional formatting to Ceased Services row (Physio only).
+    Build conditional formatting rules for the Ceased Services row (Physio only).
     
     NEW: Applies to a single row (C5:O5) instead of a column.
     Lower is better for ceased services.
     
     Args:
-        ws: Worksheet
         ceased_thresholds: Dict with blue_below, green_min, green_max, red_above
         colours: Color config dict
         kpi_row: Row number for Ceased Services (default 5)
+        
+    Returns:
+        list: [(cell_range, rule), ...]
     """
+    rules = []
+    
     # Get threshold values from config
     blue_below = ceased_thresholds.get('blue_below', 0.025)
     red_above = ceased_thresholds.get('red_above', 0.04)
     
     logging.info(f"Ceased thresholds: blue<{blue_below}, red>={red_above}")
     
-    red_color = colours.get('red', DEFAULT_COLORS['red'])
-    green_color = colours.get('green', DEFAULT_COLORS['green'])
-    blue_color = colours.get('blue', DEFAULT_COLORS['blue'])
-    white_color = colours.get('white', DEFAULT_COLORS['white'])
-    
-    red_fill = PatternFill(start_color=red_color, end_color=red_color, fill_type='solid')
-    green_fill = PatternFill(start_color=green_color, end_color=green_color, fill_type='solid')
-    blue_fill = PatternFill(start_color=blue_color, end_color=blue_color, fill_type='solid')
-    white_fill = PatternFill(start_color=white_color, end_color=white_color, fill_type='solid')
+    red_fill = get_fill(colours, 'red')
+    green_fill = get_fill(colours, 'green')
+    blue_fill = get_fill(colours, 'blue')
+    white_fill = get_fill(colours, 'white')
     
     # Ceased row range: C{row}:O{row} (includes Average column)
-    ceased_range = f'C{kpi_row}:O{kpi_row}'
+    ceased_range = ROW_RANGES[kpi_row]
     
     # 1. White for blank
-    ws.conditional_formatting.add(ceased_range,
-        FormulaRule(formula=[f'=LEN(TRIM(C{kpi_row}))=0'], fill=white_fill))
+    rules.append((ceased_range,
+        FormulaRule(formula=[BLANK_FORMULAS[kpi_row]], fill=white_fill)))
     
     # 2. Blue for < blue_below (excellent - very low ceased rate)
-    ws.conditional_formatting.add(ceased_range,
-        CellIsRule(operator='lessThan', formula=[str(blue_below)], fill=blue_fill))
+    rules.append((ceased_range,
+        CellIsRule(operator='lessThan', formula=[str(blue_below)], fill=blue_fill)))
     
     # 3. Green for < red_above (good - acceptable ceased rate)
-    ws.conditional_formatting.add(ceased_range,
-        CellIsRule(operator='lessThan', formula=[str(red_above)], fill=green_fill))
+    rules.append((ceased_range,
+        CellIsRule(operator='lessThan', formula=[str(red_above)], fill=green_fill)))
     
     # 4. Red for >= red_above (poor - high ceased rate)
-    ws.conditional_formatting.add(ceased_range,
-        CellIsRule(operator='greaterThanOrEqual', formula=[str(red_above)], fill=red_fill))
+    rules.append((ceased_range,
+        CellIsRule(operator='greaterThanOrEqual', formula=[str(red_above)], fill=red_fill)))
+    
+    return rules
 
 
-def apply_rating_scale_formatting_v2(ws, kpi_rows, rating_thresholds, colours):
+def rating_scale_rules_v2(kpi_rows, rating_thresholds, colours):
     """
-    Apply conditional formatting using 1-5 rating scale to KPI rows.
+    Build conditional formatting rules for the 1-5 rating scale KPI rows.
     
     NEW: Applies to row ranges (C{row}:O{row}) instead of column ranges.
+    All rows share one rule set on a space-separated multi-range sqref.
     
     Args:
-        ws: Worksheet
         kpi_rows: List of row numbers to format (e.g., [6, 7, 8])
         rating_thresholds: List of threshold dicts with rating, min, max
         colours: Color config dict
+        
+    Returns:
+        list: [(cell_range, rule), ...]
     """
-    red_color = colours.get('red', DEFAULT_COLORS['red'])
-    amber_color = colours.get('amber', DEFAULT_COLORS['amber'])
-    yellow_color = colours.get('yellow', DEFAULT_COLORS['yellow'])
-    green_color = colours.get('green', DEFAULT_COLORS['green'])
-    blue_color = colours.get('blue', DEFAULT_COLORS['blue'])
-    white_color = colours.get('white', DEFAULT_COLORS['white'])
+    rules = []
     
-    red_fill = PatternFill(start_color=red_color, end_color=red_color, fill_type='solid')
-    amber_fill = PatternFill(start_color=amber_color, end_color=amber_color, fill_type='solid')
-    yellow_fill = PatternFill(start_color=yellow_color, end_color=yellow_color, fill_type='solid')
-    green_fill = PatternFill(start_color=green_color, end_color=green_color, fill_type='solid')
-    blue_fill = PatternFill(start_color=blue_color, end_color=blue_color, fill_type='solid')
-    white_fill = PatternFill(start_color=white_color, end_color=white_color, fill_type='solid')
+    red_fill = get_fill(colours, 'red')
+    amber_fill = get_fill(colours, 'amber')
+    yellow_fill = get_fill(colours, 'yellow')
+    green_fill = get_fill(colours, 'green')
+    blue_fill = get_fill(colours, 'blue')
+    white_fill = get_fill(colours, 'white')
     
     color_map = {
         1: red_fill,
@@ -539,29 +703,170 @@ def apply_rating_scale_formatting_v2(ws, kpi_rows, rating_thresholds, colours):
         5: blue_fill
     }
     
-    for row in kpi_rows:
-        cell_range = f'C{row}:O{row}'  # Includes Average column
+    if not kpi_rows:
+        return rules
+    
+    # One multi-range sqref (e.g. "C6:O6 C7:O7 C8:O8", includes Average column) shares
+    # each rule across all rows - one <conditionalFormatting> block instead of one per row
+    cell_range = ' '.join(ROW_RANGES[row] for row in kpi_rows)
+    first_row = kpi_rows[0]
+    
+    # 1. White for blank (relative to the top-left cell of the sqref)
+    rules.append((cell_range,
+        FormulaRule(formula=[BLANK_FORMULAS[first_row]], fill=white_fill)))
+    
+    # Apply rules from config (highest rating first for priority)
+    for threshold in reversed(rating_thresholds):
+        rating = threshold['rating']
+        min_val = threshold['min']
+        max_val = threshold['max']
+        fill = color_map.get(rating, white_fill)
         
-        # 1. White for blank
-        ws.conditional_formatting.add(cell_range,
-            FormulaRule(formula=[f'=LEN(TRIM(C{row}))=0'], fill=white_fill))
+        if rating == 5:
+            rules.append((cell_range,
+                CellIsRule(operator='greaterThanOrEqual', formula=[str(min_val)], fill=fill)))
+        elif rating == 1:
+            rules.append((cell_range,
+                CellIsRule(operator='lessThan', formula=[str(max_val)], fill=fill)))
+        else:
+            rules.append((cell_range,
+                CellIsRule(operator='between', formula=[str(min_val), str(max_val)], fill=fill)))
+    
+    return rules
+
+
+def build_cf_rules(team_type, therapist_name, year, config, thresholds_all):
+    """
+    Build the full conditional formatting rule set for a Dashboard sheet.
+    
+    Physio: Billings (row 4) with competency history, Ceased (row 5), rating scale (rows 6-8).
+    OT: Billings (row 4) with competency history, rating scale (rows 5-8).
+    
+    Returns:
+        list: [(cell_range, rule), ...] in priority order
+    """
+    colours = config['colours']
+    rules = billing_rules_with_history(therapist_name, year, config, thresholds_all, colours, kpi_row=4)
+    if team_type != 'OT':
+        rules += ceased_services_rules_v2(config['ceased_thresholds'], colours, kpi_row=5)
+    rules += rating_scale_rules_v2(RATING_ROWS[team_type], config['rating_thresholds'], colours)
+    return rules
+
+
+def build_cf_list(rules):
+    """
+    Collect (cell_range, rule) pairs into a fresh ConditionalFormattingList.
+    
+    Each distinct range is parsed into a ConditionalFormatting once and shared
+    by all of its rules, rather than re-parsed on every add().
+    """
+    cf_list = ConditionalFormattingList()
+    cf_by_range = {}
+    for cell_range, rule in rules:
+        cf = cf_by_range.get(cell_range)
+        if cf is None:
+            cf = cf_by_range[cell_range] = ConditionalFormatting(cell_range)
+        cf_list.add(cf, rule)
+    return cf_list
+
+
+# =============================================================================
+# THRESHOLD DISPLAY
+# =============================================================================
+
+def threshold_display_cells(team_type, config):
+    """
+    Threshold legend text for a Dashboard sheet, rendered once per team type.
+    
+    The rendered cells are memoised on the config (config['_threshold_display_cache']),
+    so every therapist sheet in a sync run reuses the same list.
+    
+    - Billing thresholds: rows 12-14 (Grad/CA/Senior), columns C-E
+    - Ceased Services thresholds (Physio only): rows 17-19, column B
+    
+    Returns:
+        list: [(row, col, text), ...]
+    """
+    cache = config.setdefault('_threshold_display_cache', {})
+    if team_type in cache:
+        return cache[team_type]
+    
+    cells = []
+    thresholds_all = config['thresholds'].get(team_type, {})
+    
+    for comp_level, row in THRESHOLD_ROWS['billings'].items():
+        comp_thresholds = thresholds_all.get(comp_level, {})
+        if comp_thresholds:
+            try:
+                cells += [
+                    # Column C: Below threshold
+                    (row, 3, f"<{comp_thresholds.get('green_min', '')}"),
+                    # Column D: Good range
+                    (row, 4, f"{comp_thresholds.get('green_min', '')}-{comp_thresholds.get('green_max', '')}"),
+                    # Column E: Excellent
+                    (row, 5, f">{comp_thresholds.get('blue_above', '')}"),
+                ]
+            except Exception as e:
+                logging.warning(f"Could not write {comp_level} thresholds: {e}")
+    
+    # Note: Column D has labels (Excellent/Good/Below), values go in B
+    if team_type == 'Physio':
+        ceased = config.get('ceased_thresholds', {})
+        blue_below = ceased.get('blue_below', 0.025)
+        red_above = ceased.get('red_above', 0.04)
         
-        # Apply rules from config (highest rating first for priority)
-        for threshold in reversed(rating_thresholds):
-            rating = threshold['rating']
-            min_val = threshold['min']
-            max_val = threshold['max']
-            fill = color_map.get(rating, white_fill)
-            
-            if rating == 5:
-                ws.conditional_formatting.add(cell_range,
-                    CellIsRule(operator='greaterThanOrEqual', formula=[str(min_val)], fill=fill))
-            elif rating == 1:
-                ws.conditional_formatting.add(cell_range,
-                    CellIsRule(operator='lessThan', formula=[str(max_val)], fill=fill))
-            else:
-                ws.conditional_formatting.add(cell_range,
-                    CellIsRule(operator='between', formula=[str(min_val), str(max_val)], fill=fill))
+        try:
+            cells += [
+                # Row 17: Excellent (< blue_below)
+                (17, 2, f"<{blue_below*100:.1f}%"),
+                # Row 18: Good (between)
+                (18, 2, f"{blue_below*100:.1f}-{red_above*100:.1f}%"),
+                # Row 19: Below (>= red_above)
+                (19, 2, f">{red_above*100:.1f}%"),
+            ]
+        except Exception as e:
+            logging.warning(f"Could not write ceased thresholds: {e}")
+    
+    cache[team_type] = cells
+    return cells
+
+
+# =============================================================================
+# CHANGE DETECTION
+# =============================================================================
+
+# Block of the Dashboard sheet written by update_individual_sheet_v2:
+# name/competency (row 2), KPI rows 4-8, threshold displays down to row 19
+DASHBOARD_MIN_ROW, DASHBOARD_MAX_ROW = 2, 19
+DASHBOARD_MIN_COL, DASHBOARD_MAX_COL = 2, 15  # B to O
+
+
+def dashboard_snapshot(ws):
+    """
+    Capture everything update_individual_sheet_v2 writes to the Dashboard sheet.
+    
+    Two equal snapshots (before and after an update) mean the workbook would be
+    saved and uploaded unchanged, so the rewrite can be skipped. Styles are
+    copied out of their cell proxies so they compare by value.
+    
+    Returns:
+        tuple: (cell values/styles, conditional formatting rules)
+    """
+    cells = tuple(
+        (cell.value, cell.number_format, cell.alignment.copy(), cell.font.copy())
+        for row in ws.iter_rows(min_row=DASHBOARD_MIN_ROW, max_row=DASHBOARD_MAX_ROW,
+                                min_col=DASHBOARD_MIN_COL, max_col=DASHBOARD_MAX_COL)
+        for cell in row
+    )
+    rules = tuple(
+        (str(cf.sqref), tuple(
+            (rule.type, rule.operator, tuple(rule.formula or ()),
+             rule.dxf.fill if rule.dxf is not None else None)
+            for rule in cf.rules
+        ))
+        for cf in ws.conditional_formatting
+    )
+    return cells, rules
 
 
 # =============================================================================
@@ -570,7 +875,8 @@ def apply_rating_scale_formatting_v2(ws, kpi_rows, rating_thresholds, colours):
 
 def update_individual_sheet_v2(therapist, config, master_data, token, 
                                 resolve_file_path, download_excel_file, 
-                                upload_excel_file, create_from_template, year=None):
+                                upload_excel_file, create_from_template, year=None,
+                                kpi_index=None):
     """
     Update a single therapist's individual KPI sheet - NEW TEMPLATE LAYOUT.
     
@@ -586,6 +892,7 @@ def update_individual_sheet_v2(therapist, config, master_data, token,
         upload_excel_file: Function to upload Excel files
         create_from_template: Function to create file from template
         year: Year for competency history lookup (e.g., 2026)
+        kpi_index: Optional {team: {name: [records]}} lookup built from master_data
         
     Returns:
         bool: Success/failure
@@ -613,15 +920,18 @@ def update_individual_sheet_v2(therapist, config, master_data, token,
             return False
     
     # Get KPI data for this therapist
-    team_data = master_data.get(team_id, [])
-    kpi_records = [r for r in team_data if r.get('Name') == name or r.get('UniqueTeamMembers') == name]
+    if kpi_index is not None:
+        kpi_records = kpi_index.get(team_id, {}).get(name, [])
+    else:
+        team_data = master_data.get(team_id, [])
+        kpi_records = [r for r in team_data if r.get('Name') == name or r.get('UniqueTeamMembers') == name]
     
     if not kpi_records:
         logging.warning(f"No KPI data for {name} in team {team_id} - continuing to update thresholds")
     
-    # Download file
-    file_content = download_excel_file(file_id, token)
-    wb = load_workbook(file_content)
+    # Download file - load_workbook reads it fully, so the download buffer is closed straight after
+    with download_excel_file(file_id, token) as file_content:
+        wb = load_workbook(file_content)
     
     # Find Dashboard sheet
     dashboard_sheet = None
@@ -636,61 +946,59 @@ def update_individual_sheet_v2(therapist, config, master_data, token,
         return False
     
     ws = wb[dashboard_sheet]
+    before = dashboard_snapshot(ws)
     
     # Select KPI row mapping based on team type
     kpi_rows = KPI_ROWS_OT if team_type == 'OT' else KPI_ROWS_PHYSIO
     
+    # KPI data block (rows 4-8, columns C-O), fetched once: {row: (C, D, ..., O)}
+    kpi_block = {
+        row_cells[0].row: row_cells
+        for row_cells in ws.iter_rows(min_row=4, max_row=8, min_col=3, max_col=15)
+    }
+    
     # =========================================================================
     # WRITE KPI DATA (months as columns, KPIs as rows)
     # =========================================================================
+    # Collect the grid first so each cell is written once (later records win)
+    cell_updates = {}
     for record in kpi_records:
-        month = record.get('Month')
-        if month not in MONTH_COLUMNS:
+        col = month_column(record.get('Month'))
+        if col is None:
             continue
         
-        col = MONTH_COLUMNS[month]
-        
         for kpi_name, row in kpi_rows.items():
             value = record.get(kpi_name)
             if value is not None:
-                ws.cell(row=row, column=col, value=value)
+                cell_updates[(row, col)] = value
+    
+    for (row, col), value in cell_updates.items():
+        kpi_block[row][col - 3].value = value
     
     # =========================================================================
     # APPLY CELL FORMATTING (number format, alignment, font)
     # =========================================================================
     
-    # Define standard formatting
-    center_align = Alignment(horizontal='center', vertical='center')
-    black_font = Font(color='000000')
-    
     # Format all KPI data cells (rows 4-8, columns C-O)
-    for row in range(4, 9):
-        for col in range(3, 16):  # C to O
-            cell = ws.cell(row=row, column=col)
-            cell.alignment = center_align
-            cell.font = black_font
+    for row_cells in kpi_block.values():
+        for cell in row_cells:
+            cell.alignment = CENTER_ALIGN
+            cell.font = BLACK_FONT
     
     # BillingsKPI row (row 4): 2 decimal places for average
-    billings_avg_cell = ws.cell(row=4, column=15)  # O4
-    billings_avg_cell.number_format = '0.00'
+    kpi_block[4][-1].number_format = '0.00'  # O4
     
     # Ceased Services row (row 5, Physio only): percentage format
     if team_type == 'Physio':
-        for col in range(3, 16):  # C to O
-            cell = ws.cell(row=5, column=col)
+        for cell in kpi_block[5]:  # C to O
             cell.number_format = '0.0%'
         
         # Set correct average formula for Ceased Services (include 0s, exclude blanks)
-        ceased_avg_cell = ws.cell(row=5, column=15)  # O5
-        ceased_avg_cell.value = '=IFERROR(AVERAGEIF($C5:$N5,"<>"),"")' 
-        
-        # Rating scale KPI averages (rows 6-8): 2 decimal places
-        for row in [6, 7, 8]:
-            ws.cell(row=row, column=15).number_format = '0.00'
-    else:
-        # OT: Rating scale KPI averages (rows 5-8): 2 decimal places
-        for row in [5, 6, 7, 8]:
-            ws.cell(row=row, column=15).number_format = '0.00'
+        kpi_block[5][-1].value = '=IFERROR(AVERAGEIF($C5:$N5,"<>"),"")'  # O5
+    
+    # Rating scale KPI averages (Physio rows 6-8, OT rows 5-8): 2 decimal places
+    for row in RATING_ROWS[team_type]:
+        kpi_block[row][-1].number_format = '0.00'
     
     # =========================================================================
     # WRITE THERAPIST INFO
@@ -706,62 +1014,29 @@ def update_individual_sheet_v2(therapist, config, master_data, token,
     # =========================================================================
     thresholds_all = config['thresholds'].get(team_type, {})
     
-    # Billing thresholds: Rows 12-14, Columns C-E
-    for comp_level, row in THRESHOLD_ROWS['billings'].items():
-        comp_thresholds = thresholds_all.get(comp_level, {})
-        if comp_thresholds:
-            try:
-                # Column C: Below threshold
-                ws.cell(row=row, column=3, value=f"<{comp_thresholds.get('green_min', '')}")
-                # Column D: Good range
-                ws.cell(row=row, column=4, value=f"{comp_thresholds.get('green_min', '')}-{comp_thresholds.get('green_max', '')}")
-                # Column E: Excellent
-                ws.cell(row=row, column=5, value=f">{comp_thresholds.get('blue_above', '')}")
-            except Exception as e:
-                logging.warning(f"Could not write {comp_level} thresholds: {e}")
-    
-    # Ceased Services thresholds: Rows 17-19, Column E (Physio only)
-    # Note: Column D has labels (Excellent/Good/Below), values go in E
-    if team_type == 'Physio':
-        ceased = config.get('ceased_thresholds', {})
-        blue_below = ceased.get('blue_below', 0.025)
-        red_above = ceased.get('red_above', 0.04)
-        
-        try:
-            # Row 17: Excellent (< blue_below)
-            ws.cell(row=17, column=2, value=f"<{blue_below*100:.1f}%")
-            # Row 18: Good (between)
-            ws.cell(row=18, column=2, value=f"{blue_below*100:.1f}-{red_above*100:.1f}%")
-            # Row 19: Below (>= red_above)
-            ws.cell(row=19, column=2, value=f">{red_above*100:.1f}%")
-        except Exception as e:
-            logging.warning(f"Could not write ceased thresholds: {e}")
+    for row, col, text in threshold_display_cells(team_type, config):
+        ws.cell(row=row, column=col).value = text
     
     # =========================================================================
     # APPLY CONDITIONAL FORMATTING
     # =========================================================================
     
-    # Clear existing conditional formatting
-    ws.conditional_formatting._cf_rules = {}
-    
-    if team_type == 'OT':
-        # OT: Billings (row 4) with competency history, then rating scale (rows 5-8)
-        apply_billing_formatting_with_history(ws, name, year, config, thresholds_all, config['colours'], kpi_row=4)
-        apply_rating_scale_formatting_v2(ws, [5, 6, 7, 8], config['rating_thresholds'], config['colours'])
-    else:
-        # Physio: Billings (row 4) with competency history, Ceased (row 5), then rating scale (rows 6-8)
-        apply_billing_formatting_with_history(ws, name, year, config, thresholds_all, config['colours'], kpi_row=4)
-        apply_ceased_services_formatting_v2(ws, config['ceased_thresholds'], config['colours'], kpi_row=5)
-        apply_rating_scale_formatting_v2(ws, [6, 7, 8], config['rating_thresholds'], config['colours'])
+    # Replace existing conditional formatting with the freshly built rule set
+    ws.conditional_formatting = build_cf_list(build_cf_rules(team_type, name, year, config, thresholds_all))
     
     # =========================================================================
     # SAVE AND UPLOAD
     # =========================================================================
-    output = BytesIO()
-    wb.save(output)
-    wb.close()
+    if dashboard_snapshot(ws) == before:
+        # Same data, formats and rules as the stored file - skip the full rewrite
+        wb.close()
+        logging.info(f"{name} unchanged - skipped save and upload (v2)")
+        return True
     
-    upload_excel_file(file_path, output, token)
+    with SpooledTemporaryFile(max_size=SAVE_SPOOL_MAX_SIZE) as output:
+        wb.save(output)
+        wb.close()
+        upload_excel_file(file_path, output, token)
     logging.info(f"Updated {name} (v2)")
     return True
 
@@ -770,35 +1045,24 @@ def update_individual_sheet_v2(therapist, config, master_data, token,
 # WRAPPER FOR EASY INTEGRATION
 # =============================================================================
 
-def create_from_template(therapist, config, token):
+def create_from_template(therapist, config, token, template_cache=None):
     """
-    Wrapper that imports dependencies and calls create_from_template_v2.
+    Wrapper that passes the Graph helpers to create_from_template_v2.
     
     Drop-in replacement for the original function.
     Works with both function_app.py (Azure) and function_app_local.py (local testing).
     """
-    try:
-        from function_app import (
-            resolve_file_path,
-            download_excel_file,
-            upload_excel_file
-        )
-    except ImportError:
-        from function_app_local import (
-            resolve_file_path,
-            download_excel_file,
-            upload_excel_file
-        )
-    
     return create_from_template_v2(
         therapist, config, token,
-        resolve_file_path, download_excel_file, upload_excel_file
+        graph_api.resolve_file_path, graph_api.download_excel_file, graph_api.upload_excel_file,
+        template_cache
     )
 
 
-def update_individual_sheet(therapist, config, master_data, token, year=None):
+def update_individual_sheet(therapist, config, master_data, token, year=None, kpi_index=None,
+                            template_cache=None):
     """
-    Wrapper that imports dependencies and calls update_individual_sheet_v2.
+    Wrapper that passes the Graph helpers to update_individual_sheet_v2.
     
     Drop-in replacement for the original function.
     Works with both function_app.py (Azure) and function_app_local.py (local testing).
@@ -809,23 +1073,13 @@ def update_individual_sheet(therapist, config, master_data, token, year=None):
         master_data: KPI data from Team Leader file
         token: Graph API token
         year: Year for competency history lookup (e.g., 2026)
+        kpi_index: Optional {team: {name: [records]}} lookup built from master_data
+        template_cache: Optional {template_path: bytes} shared across one sync run
     """
-    try:
-        from function_app import (
-            resolve_file_path,
-            download_excel_file,
-            upload_excel_file
-        )
-    except ImportError:
-        from function_app_local import (
-            resolve_file_path,
-            download_excel_file,
-            upload_excel_file
-        )
-    
     # Use local create_from_template which calls v2
     return update_individual_sheet_v2(
         therapist, config, master_data, token,
-        resolve_file_path, download_excel_file,
-        upload_excel_file, create_from_template, year
+        graph_api.resolve_file_path, graph_api.download_excel_file,
+        graph_api.upload_excel_file, partial(create_from_template, template_cache=template_cache),
+        year, kpi_index
     )
@@ -11,6 +11,12 @@ FIXES (Nov 30, 2025):
 """
 
 import logging
+import re
+from bisect import bisect_right
+from datetime import date
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
 from openpyxl.styles import PatternFill
 from openpyxl.utils import range_boundaries, get_column_letter
 from openpyxl.formatting.rule import CellIsRule, FormulaRule
@@ -22,6 +28,7 @@ from openpyxl.formatting.formatting import ConditionalFormattingList
 # =============================================================================
 
 DATA_COLUMNS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'June', 'July', 'Aug', 'Sept', 'Oct', 'Nov', 'Dec', 'Average']
+DATA_COLUMN_SET = frozenset(DATA_COLUMNS)  # O(1) header membership tests
 
 # Month name to number mapping for competency history
 MONTH_TO_NUM = {
@@ -29,6 +36,9 @@ MONTH_TO_NUM = {
     'July': 7, 'Aug': 8, 'Sept': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
 }
 
+# Four-digit year in file names like 'Team_Leader_2026.xlsx'
+YEAR_PATTERN = re.compile(r'(\d{4})')
+
 DEFAULT_COLORS = {
     'red': 'FFE47373',
     'amber': 'FFFFB74D',
@@ -109,53 +119,57 @@ SHEET_CONFIG = {
 
 def build_competency_map(config, team_name):
     """Map therapist names to competencies for a specific team."""
-    competency_map = {}
-    for therapist in config.get('therapists', []):
-        if therapist.get('Team') == team_name:
-            name = therapist.get('Name')
-            competency = therapist.get('Competency')
-            if name and competency:
-                competency_map[name.strip()] = competency
+    competency_map = {
+        therapist['Name'].strip(): therapist['Competency']
+        for therapist in config.get('therapists', [])
+        if therapist.get('Team') == team_name and therapist.get('Name') and therapist.get('Competency')
+    }
     logging.info(f"Competency map for {team_name}: {len(competency_map)} therapists - {list(competency_map.keys())}")
     return competency_map
 
 
+@lru_cache(maxsize=None)
+def solid_fill(color):
+    """Solid PatternFill for an ARGB colour - built once per colour and shared by all tables."""
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
 def create_fills(colours):
-    """Create PatternFill objects from config colours."""
-    def get_color(name):
-        return colours.get(name, DEFAULT_COLORS.get(name, 'FFFFFFFF'))
-    
+    """Map colour names to cached PatternFill objects from config colours."""
     return {
-        'red': PatternFill(start_color=get_color('red'), end_color=get_color('red'), fill_type='solid'),
-        'amber': PatternFill(start_color=get_color('amber'), end_color=get_color('amber'), fill_type='solid'),
-        'yellow': PatternFill(start_color=get_color('yellow'), end_color=get_color('yellow'), fill_type='solid'),
-        'green': PatternFill(start_color=get_color('green'), end_color=get_color('green'), fill_type='solid'),
-        'blue': PatternFill(start_color=get_color('blue'), end_color=get_color('blue'), fill_type='solid'),
-        'white': PatternFill(start_color=get_color('white'), end_color=get_color('white'), fill_type='solid'),
+        name: solid_fill(colours.get(name, DEFAULT_COLORS.get(name, 'FFFFFFFF')))
+        for name in ('red', 'amber', 'yellow', 'green', 'blue', 'white')
     }
 
 
 def get_table_info(ws, table_name):
     """Get table boundaries and column mapping."""
-    if table_name not in ws.tables:
+    table = ws.tables.get(table_name)
+    if table is None:
         return None
     
-    table = ws.tables[table_name]
     min_col, min_row, max_col, max_row = range_boundaries(table.ref)
     
-    header_row = [ws.cell(row=min_row, column=col).value for col in range(min_col, max_col + 1)]
+    header_row = next(ws.iter_rows(min_row=min_row, max_row=min_row,
+                                   min_col=min_col, max_col=max_col, values_only=True))
     
     data_cols = {}
     for i, header in enumerate(header_row):
-        if header in DATA_COLUMNS:
+        if header in DATA_COLUMN_SET:
             data_cols[header] = min_col + i
     
+    # (month number, column) for each month column in calendar order - Average
+    # and any unrecognised headers drop out here
+    month_cols = tuple(sorted((MONTH_TO_NUM[m], c) for m, c in data_cols.items() if m in MONTH_TO_NUM))
+    
     return {
         'min_col': min_col,
         'min_row': min_row,
         'max_col': max_col,
         'max_row': max_row,
-        'data_cols': data_cols
+        'data_cols': data_cols,
+        'month_cols': month_cols,
+        'avg_col': data_cols.get('Average')
     }
 
 
@@ -174,11 +188,9 @@ def detect_row_kpi_type(row_label):
 def clear_all_conditional_formatting(ws):
     """Completely clear all conditional formatting from a worksheet."""
     try:
-        if hasattr(ws, 'conditional_formatting') and ws.conditional_formatting:
-            if hasattr(ws.conditional_formatting, '_cf_rules'):
-                old_count = len(ws.conditional_formatting._cf_rules)
-                if old_count > 0:
-                    logging.info(f"Clearing {old_count} existing rules from '{ws.title}'")
+        old_count = len(ws.conditional_formatting)
+        if old_count > 0:
+            logging.info(f"Clearing {old_count} existing rule ranges from '{ws.title}'")
         ws.conditional_formatting = ConditionalFormattingList()
         return True
     except Exception as e:
@@ -188,11 +200,10 @@ def clear_all_conditional_formatting(ws):
 
 def extract_year_from_filename(file_path):
     """Extract year from filename like 'Team_Leader_2026.xlsx'."""
-    import re
     if not file_path:
         return None
     filename = file_path.split('/')[-1]
-    match = re.search(r'(\d{4})', filename)
+    match = YEAR_PATTERN.search(filename)
     if match:
         year = int(match.group(1))
         if 2020 <= year <= 2100:
@@ -200,91 +211,87 @@ def extract_year_from_filename(file_path):
     return None
 
 
-def get_competency_ranges_for_therapist(therapist_name, year, data_cols, config):
+def get_competency_ranges_for_therapist(therapist_name, year, month_cols, avg_col, config):
     """
     Get column ranges for each competency period for a therapist.
     
+    Results are memoised on the config (config['_tl_competency_ranges_cache'])
+    keyed by normalised name, year and table columns, so a therapist listed in
+    several billing tables is only worked out once per loaded config.
+    
+    Args:
+        month_cols: get_table_info's ((month number, column), ...) in calendar order
+        avg_col: Average column (or None)
+    
     Returns list of tuples: [(competency, start_col, end_col), ...]
     
     Example for Chris (CA Jan, Senior from Feb):
     [('CA', 3, 3), ('Senior', 4, 15)]  # C for Jan, D-O for Feb-Dec+Avg
     """
-    from datetime import date
-    
-    history = config.get('competency_history', [])
+    key = therapist_name.strip().lower()
+    # Fewer than two dated records can give at most one range, which is
+    # reported as None anyway - most therapists stop here
+    by_name = config.get('_competency_by_name')
+    if by_name is not None and len(by_name.get(key, ())) < 2:
+        return None
     
-    # Get records for this therapist
-    therapist_records = [
-        r for r in history
-        if r.get('Name', '').strip().lower() == therapist_name.strip().lower()
-        and r.get('EffectiveDate')
-    ]
+    cache = config.setdefault('_tl_competency_ranges_cache', {})
+    cache_key = (key, year, month_cols, avg_col)
+    if cache_key not in cache:
+        cache[cache_key] = compute_competency_ranges(key, year, month_cols, avg_col, config)
+    return cache[cache_key]
+
+
+def compute_competency_ranges(key, year, month_cols, avg_col, config):
+    """Uncached worker for get_competency_ranges_for_therapist (key: normalised name)."""
+    # Get records for this therapist, sorted by date ascending. load_config's
+    # indexes hold dated records only, with their dates already normalised.
+    by_name = config.get('_competency_by_name')
+    dates_by_name = config.get('_competency_dates_by_name')
+    effective_dates = None
+    if by_name is not None:
+        therapist_records = by_name.get(key, ())
+        if dates_by_name is not None:
+            effective_dates = dates_by_name.get(key, ())
+    else:
+        therapist_records = sorted(
+            (r for r in config.get('competency_history', [])
+             if r.get('Name', '').strip().lower() == key
+             and r.get('EffectiveDate')),
+            key=lambda r: r.get('EffectiveDate')
+        )
     
     if not therapist_records or not year:
         # No history - return None to use standard single-range formatting
         return None
     
-    # Sort by date ascending
-    therapist_records.sort(key=lambda r: r.get('EffectiveDate'))
-    
-    # Build month -> column mapping (excluding Average)
-    month_cols = {m: c for m, c in data_cols.items() if m != 'Average'}
-    avg_col = data_cols.get('Average')
-    
-    # Sort months by their calendar order
-    sorted_months = sorted(month_cols.items(), key=lambda x: MONTH_TO_NUM.get(x[0], 99))
+    if effective_dates is None:
+        effective_dates = []
+        for record in therapist_records:
+            eff_date = record.get('EffectiveDate')
+            effective_dates.append(eff_date.date() if hasattr(eff_date, 'date') else eff_date)
     
-    # Determine competency for each month
-    month_competencies = {}
-    for month_name, col in sorted_months:
-        month_num = MONTH_TO_NUM.get(month_name)
-        if not month_num:
-            continue
-        
+    # Determine competency for each month, in calendar order
+    month_competencies = []
+    for month_num, col in month_cols:
         # Target date is mid-month of that month in the given year
         target_date = date(year, month_num, 15)
         
         # Find applicable competency (latest record where EffectiveDate <= target)
-        applicable_comp = None
-        for record in therapist_records:
-            eff_date = record.get('EffectiveDate')
-            if hasattr(eff_date, 'date'):
-                eff_date = eff_date.date()
-            if eff_date <= target_date:
-                applicable_comp = record.get('Competency')
+        idx = bisect_right(effective_dates, target_date) - 1
+        applicable_comp = therapist_records[idx].get('Competency') if idx >= 0 else None
         
         if applicable_comp:
-            month_competencies[month_name] = (applicable_comp, col)
+            month_competencies.append((applicable_comp, col))
     
     if not month_competencies:
         return None
     
     # Group consecutive months with same competency into ranges
     ranges = []
-    current_comp = None
-    range_start_col = None
-    range_end_col = None
-    
-    for month_name, col in sorted_months:
-        if month_name not in month_competencies:
-            continue
-        comp, col = month_competencies[month_name]
-        
-        if comp == current_comp:
-            # Extend current range
-            range_end_col = col
-        else:
-            # Save previous range if exists
-            if current_comp is not None:
-                ranges.append((current_comp, range_start_col, range_end_col))
-            # Start new range
-            current_comp = comp
-            range_start_col = col
-            range_end_col = col
-    
-    # Don't forget the last range
-    if current_comp is not None:
-        ranges.append((current_comp, range_start_col, range_end_col))
+    for comp, group in groupby(month_competencies, key=itemgetter(0)):
+        cols = [col for _, col in group]
+        ranges.append((comp, cols[0], cols[-1]))
     
     # Add Average column to the last competency's range
     if ranges and avg_col:
@@ -294,7 +301,7 @@ def get_competency_ranges_for_therapist(therapist_name, year, data_cols, config)
     return ranges if len(ranges) > 1 else None  # Only return if there are multiple ranges
 
 
-def get_team_ave_threshold_ranges(team_name, year, data_cols, config):
+def get_team_ave_threshold_ranges(team_name, year, month_cols, avg_col, config):
     """
     Get column ranges for each threshold period for a team's billing row.
     
@@ -307,55 +314,65 @@ def get_team_ave_threshold_ranges(team_name, year, data_cols, config):
     # C-D for Jan-Feb, E-O for Mar-Dec+Avg
     
     Returns None if no history exists (use static thresholds instead).
+    Memoised on the config like get_competency_ranges_for_therapist.
     """
-    from datetime import date
-    
-    history = config.get('team_ave_thresholds', [])
+    by_team = config.get('_team_ave_by_team')
+    if by_team is not None and len(by_team.get(team_name.strip(), ())) < 2:
+        return None
     
-    # Get records for this team
-    team_records = [
-        r for r in history
-        if r.get('Team', '').strip() == team_name.strip()
-        and r.get('EffectiveDate')
-    ]
+    cache = config.setdefault('_tl_team_ave_ranges_cache', {})
+    cache_key = (team_name.strip(), year, month_cols, avg_col)
+    if cache_key not in cache:
+        cache[cache_key] = compute_team_ave_threshold_ranges(team_name, year, month_cols, avg_col, config)
+    return cache[cache_key]
+
+
+def compute_team_ave_threshold_ranges(team_name, year, month_cols, avg_col, config):
+    """Uncached worker for get_team_ave_threshold_ranges."""
+    # Get records for this team, sorted by date ascending. load_config's
+    # indexes hold dated records only, with their dates already normalised.
+    by_team = config.get('_team_ave_by_team')
+    dates_by_team = config.get('_team_ave_dates_by_team')
+    effective_dates = None
+    if by_team is not None:
+        team_records = by_team.get(team_name.strip(), ())
+        if dates_by_team is not None:
+            effective_dates = dates_by_team.get(team_name.strip(), ())
+    else:
+        team_records = sorted(
+            (r for r in config.get('team_ave_thresholds', [])
+             if r.get('Team', '').strip() == team_name.strip()
+             and r.get('EffectiveDate')),
+            key=lambda r: r.get('EffectiveDate')
+        )
     
     if not team_records or not year:
         # No history - return None to use standard single-range formatting
         return None
     
-    # Sort by date ascending
-    team_records.sort(key=lambda r: r.get('EffectiveDate'))
-    
-    # Build month -> column mapping (excluding Average)
-    month_cols = {m: c for m, c in data_cols.items() if m != 'Average'}
-    avg_col = data_cols.get('Average')
-    
-    # Sort months by their calendar order
-    sorted_months = sorted(month_cols.items(), key=lambda x: MONTH_TO_NUM.get(x[0], 99))
+    if effective_dates is None:
+        effective_dates = []
+        for record in team_records:
+            eff_date = record.get('EffectiveDate')
+            effective_dates.append(eff_date.date() if hasattr(eff_date, 'date') else eff_date)
     
-    # Determine thresholds for each month
-    month_thresholds = {}
-    for month_name, col in sorted_months:
-        month_num = MONTH_TO_NUM.get(month_name)
-        if not month_num:
-            continue
-        
+    # Determine thresholds for each month, in calendar order
+    month_thresholds = []
+    for month_num, col in month_cols:
         # Target date is mid-month of that month in the given year
         target_date = date(year, month_num, 15)
         
         # Find applicable thresholds (latest record where EffectiveDate <= target)
         applicable_thresholds = None
-        for record in team_records:
-            eff_date = record.get('EffectiveDate')
-            if hasattr(eff_date, 'date'):
-                eff_date = eff_date.date()
-            if eff_date <= target_date:
-                applicable_thresholds = {
-                    'red_below': record.get('Billings_Red_Below'),
-                    'green_min': record.get('Billings_Green_Min'),
-                    'green_max': record.get('Billings_Green_Max'),
-                    'blue_above': record.get('Billings_Blue_Above')
-                }
+        idx = bisect_right(effective_dates, target_date) - 1
+        if idx >= 0:
+            record = team_records[idx]
+            applicable_thresholds = {
+                'red_below': record.get('Billings_Red_Below'),
+                'green_min': record.get('Billings_Green_Min'),
+                'green_max': record.get('Billings_Green_Max'),
+                'blue_above': record.get('Billings_Blue_Above')
+            }
         
         if applicable_thresholds:
             # Create a hashable key for grouping (based on threshold values)
@@ -363,39 +380,17 @@ def get_team_ave_threshold_ranges(team_name, year, data_cols, config):
                 applicable_thresholds.get('green_min'),
                 applicable_thresholds.get('blue_above')
             )
-            month_thresholds[month_name] = (applicable_thresholds, threshold_key, col)
+            month_thresholds.append((applicable_thresholds, threshold_key, col))
     
     if not month_thresholds:
         return None
     
-    # Group consecutive months with same thresholds into ranges
+    # Group consecutive months with same thresholds into ranges (each range
+    # keeps the thresholds of its first month)
     ranges = []
-    current_key = None
-    current_thresholds = None
-    range_start_col = None
-    range_end_col = None
-    
-    for month_name, col in sorted_months:
-        if month_name not in month_thresholds:
-            continue
-        thresholds, threshold_key, col = month_thresholds[month_name]
-        
-        if threshold_key == current_key:
-            # Extend current range
-            range_end_col = col
-        else:
-            # Save previous range if exists
-            if current_thresholds is not None:
-                ranges.append((current_thresholds, range_start_col, range_end_col))
-            # Start new range
-            current_key = threshold_key
-            current_thresholds = thresholds
-            range_start_col = col
-            range_end_col = col
-    
-    # Don't forget the last range
-    if current_thresholds is not None:
-        ranges.append((current_thresholds, range_start_col, range_end_col))
+    for _, group in groupby(month_thresholds, key=itemgetter(1)):
+        group = list(group)
+        ranges.append((group[0][0], group[0][2], group[-1][2]))
     
     # Add Average column to the last threshold's range
     if ranges and avg_col:
@@ -484,6 +479,53 @@ def apply_rating_rules(ws, row_range, first_col, row_idx, rating_thresholds, fil
     return True
 
 
+def row_spans_sqref(spans):
+    """
+    Join single-row spans into one multi-range sqref and find its anchor cell.
+    
+    Relative references in a conditional-formatting formula resolve from the
+    top-left of the sqref's bounding box - the lowest row and the lowest
+    column over all of its ranges, which need not be a cell of any one range.
+    The order the ranges are listed or written in plays no part.
+    
+    Args:
+        spans: [(start_col, row_idx, end_col), ...]
+        
+    Returns:
+        tuple: (sqref, anchor_col, anchor_row)
+    """
+    sqref = ' '.join(
+        f"{get_column_letter(start_col)}{row_idx}:{get_column_letter(end_col)}{row_idx}"
+        for start_col, row_idx, end_col in spans
+    )
+    anchor_col = min(start_col for start_col, _, _ in spans)
+    anchor_row = min(row_idx for _, row_idx, _ in spans)
+    return sqref, anchor_col, anchor_row
+
+
+def apply_shared_row_rules(ws, kpi_type, row_indexes, first_col, last_col, config, fills):
+    """
+    Apply one ceased or rating rule set to several table rows at once.
+    
+    The rows' ranges are joined into a single sqref (e.g. 'C14:O14 C16:O16')
+    by row_spans_sqref, and the blank-cell formula is anchored on that
+    sqref's top-left cell. Excel shifts relative references from there for
+    every other cell in the sqref.
+    """
+    if not row_indexes:
+        return
+    row_range, anchor_col, anchor_row = row_spans_sqref(
+        [(first_col, row_idx, last_col) for row_idx in row_indexes]
+    )
+    
+    if kpi_type == 'ceased':
+        apply_ceased_rules(ws, row_range, anchor_col, anchor_row,
+                          config.get('ceased_thresholds', {}), fills)
+    else:
+        apply_rating_rules(ws, row_range, anchor_col, anchor_row,
+                          config.get('rating_thresholds', []), fills)
+
+
 # =============================================================================
 # FORMAT AVERAGE TABLES
 # =============================================================================
@@ -513,9 +555,14 @@ def format_average_table(ws, table_name, table_config, sheet_config, config, fil
             team_name = 'OT'
     
     rows_formatted = 0
-    
-    for row_idx in range(table_info['min_row'] + 1, table_info['max_row'] + 1):
-        row_label = ws.cell(row=row_idx, column=table_info['min_col']).value
+    # Ceased and rating rows share one rule set per kind - collect their row
+    # indexes and add each set once over a multi-range sqref
+    shared_rows = {'ceased': [], 'rating': []}
+    
+    # Row labels (first table column) in one pass
+    labels = ws.iter_rows(min_row=table_info['min_row'] + 1, max_row=table_info['max_row'],
+                          min_col=table_info['min_col'], max_col=table_info['min_col'], values_only=True)
+    for row_idx, (row_label,) in enumerate(labels, start=table_info['min_row'] + 1):
         if not row_label:
             continue
         row_label = str(row_label).strip()
@@ -526,7 +573,7 @@ def format_average_table(ws, table_name, table_config, sheet_config, config, fil
         if row_kpi_type == 'billing':
             # Check for team average threshold history - use column ranges if available
             threshold_ranges = get_team_ave_threshold_ranges(
-                team_name, year, table_info['data_cols'], config
+                team_name, year, table_info['month_cols'], table_info['avg_col'], config
             )
             
             if threshold_ranges:
@@ -548,16 +595,13 @@ def format_average_table(ws, table_name, table_config, sheet_config, config, fil
                 else:
                     logging.warning(f"No Team Average or CA thresholds for {team_type}")
                 
-        elif row_kpi_type == 'ceased':
-            apply_ceased_rules(ws, row_range, first_col, row_idx,
-                              config.get('ceased_thresholds', {}), fills)
-            rows_formatted += 1
-            
         else:
-            apply_rating_rules(ws, row_range, first_col, row_idx,
-                              config.get('rating_thresholds', []), fills)
+            shared_rows[row_kpi_type].append(row_idx)
             rows_formatted += 1
     
+    apply_shared_row_rules(ws, 'ceased', shared_rows['ceased'], first_col, last_col, config, fills)
+    apply_shared_row_rules(ws, 'rating', shared_rows['rating'], first_col, last_col, config, fills)
+    
     logging.info(f"Formatted {rows_formatted} rows in average table '{table_name}'")
     return rows_formatted
 
@@ -583,9 +627,16 @@ def format_regular_table(ws, table_name, table_config, sheet_config, competency_
     team_type = table_config.get('team_type') or sheet_config.get('team_type')
     
     rows_formatted = 0
-    
-    for row_idx in range(table_info['min_row'] + 1, table_info['max_row'] + 1):
-        row_label = ws.cell(row=row_idx, column=table_info['min_col']).value
+    shared_rows = []  # ceased / rating rows - one rule set for the whole table
+    # Billing: {competency: [(start_col, row_idx, end_col), ...]} - each
+    # competency's row spans share one rule set over a multi-range sqref
+    billing_spans = {}
+    team_thresholds = config.get('thresholds', {}).get(team_type, {})
+    
+    # Row labels (first table column) in one pass
+    labels = ws.iter_rows(min_row=table_info['min_row'] + 1, max_row=table_info['max_row'],
+                          min_col=table_info['min_col'], max_col=table_info['min_col'], values_only=True)
+    for row_idx, (row_label,) in enumerate(labels, start=table_info['min_row'] + 1):
         if not row_label:
             continue
         row_label = str(row_label).strip()
@@ -594,43 +645,41 @@ def format_regular_table(ws, table_name, table_config, sheet_config, competency_
             logging.debug(f"Skipping '{row_label}' - not in Config_Therapists")
             continue
         
-        row_range = f"{get_column_letter(first_col)}{row_idx}:{get_column_letter(last_col)}{row_idx}"
-        
         if kpi_type == 'billing':
             # Check for competency history - use column ranges if available
             comp_ranges = get_competency_ranges_for_therapist(
-                row_label, year, table_info['data_cols'], config
+                row_label, year, table_info['month_cols'], table_info['avg_col'], config
             )
             
             if comp_ranges:
-                # Apply different thresholds to different column ranges
+                # Different thresholds for different column ranges
                 for competency, start_col, end_col in comp_ranges:
-                    thresholds = config.get('thresholds', {}).get(team_type, {}).get(competency)
-                    if thresholds:
-                        range_str = f"{get_column_letter(start_col)}{row_idx}:{get_column_letter(end_col)}{row_idx}"
-                        apply_billing_rules(ws, range_str, start_col, row_idx, thresholds, fills)
+                    if team_thresholds.get(competency):
+                        billing_spans.setdefault(competency, []).append((start_col, row_idx, end_col))
                 rows_formatted += 1
                 logging.debug(f"  {row_label}: {len(comp_ranges)} competency ranges applied")
             else:
                 # Standard single competency for whole row
                 competency = competency_map.get(row_label)
-                thresholds = config.get('thresholds', {}).get(team_type, {}).get(competency)
-                if thresholds:
-                    apply_billing_rules(ws, row_range, first_col, row_idx, thresholds, fills)
+                if team_thresholds.get(competency):
+                    billing_spans.setdefault(competency, []).append((first_col, row_idx, last_col))
                     rows_formatted += 1
                 else:
                     logging.warning(f"No {team_type}/{competency} thresholds for '{row_label}'")
                 
-        elif kpi_type == 'ceased':
-            apply_ceased_rules(ws, row_range, first_col, row_idx,
-                              config.get('ceased_thresholds', {}), fills)
-            rows_formatted += 1
-            
-        elif kpi_type == 'rating':
-            apply_rating_rules(ws, row_range, first_col, row_idx,
-                              config.get('rating_thresholds', []), fills)
+        elif kpi_type in ('ceased', 'rating'):
+            shared_rows.append(row_idx)
             rows_formatted += 1
     
+    for competency, spans in billing_spans.items():
+        # Spans can start in different columns - the blank-cell formula is
+        # anchored on the top-left of the whole sqref, not of any one span
+        row_range, anchor_col, anchor_row = row_spans_sqref(spans)
+        apply_billing_rules(ws, row_range, anchor_col, anchor_row, team_thresholds[competency], fills)
+    
+    if kpi_type in ('ceased', 'rating'):
+        apply_shared_row_rules(ws, kpi_type, shared_rows, first_col, last_col, config, fills)
+    
     logging.info(f"Formatted {rows_formatted} rows in table '{table_name}' ({kpi_type})")
     return rows_formatted
 
@@ -639,9 +688,10 @@ def format_regular_table(ws, table_name, table_config, sheet_config, competency_
 # MAIN FUNCTIONS
 # =============================================================================
 
-def format_kpi_table(ws, table_name, table_config, sheet_config, competency_map, config, year=None):
+def format_kpi_table(ws, table_name, table_config, sheet_config, competency_map, config, year=None, fills=None):
     """Dispatch to appropriate formatter based on table type."""
-    fills = create_fills(config.get('colours', {}))
+    if fills is None:
+        fills = create_fills(config.get('colours', {}))
     kpi_type = table_config.get('kpi_type', 'rating')
     
     if kpi_type in ('average', 'mmp_average') or table_config.get('is_average'):
@@ -650,7 +700,7 @@ def format_kpi_table(ws, table_name, table_config, sheet_config, competency_map,
         return format_regular_table(ws, table_name, table_config, sheet_config, competency_map, config, fills, year)
 
 
-def format_team_leader_sheet(ws, sheet_name, config, year=None):
+def format_team_leader_sheet(ws, sheet_name, config, year=None, fills=None):
     """Format all tables in a Team Leader sheet."""
     logging.info(f"Formatting sheet: {sheet_name}")
     
@@ -671,7 +721,7 @@ def format_team_leader_sheet(ws, sheet_name, config, year=None):
     stats = {'tables_formatted': 0, 'rows_formatted': 0}
     
     for table_name, table_config in sheet_config['tables'].items():
-        rows = format_kpi_table(ws, table_name, table_config, sheet_config, competency_map, config, year)
+        rows = format_kpi_table(ws, table_name, table_config, sheet_config, competency_map, config, year, fills)
         if rows > 0:
             stats['tables_formatted'] += 1
             stats['rows_formatted'] += rows
@@ -699,6 +749,9 @@ def format_all_team_leader_sheets(wb, config, file_path=None):
     logging.info(f"Ceased thresholds: {config.get('ceased_thresholds', 'USING DEFAULTS')}")
     logging.info(f"Rating thresholds: {len(config.get('rating_thresholds', []))} entries")
     
+    # One fill set for every table in the workbook
+    fills = create_fills(config.get('colours', {}))
+    
     total_stats = {'sheets_formatted': 0, 'tables_formatted': 0, 'rows_formatted': 0}
     
     for sheet_name in SHEET_CONFIG.keys():
@@ -707,7 +760,7 @@ def format_all_team_leader_sheets(wb, config, file_path=None):
             continue
         
         ws = wb[sheet_name]
-        stats = format_team_leader_sheet(ws, sheet_name, config, year)
+        stats = format_team_leader_sheet(ws, sheet_name, config, year, fills)
         
         if stats['tables_formatted'] > 0:
             total_stats['sheets_formatted'] += 1
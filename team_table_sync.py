@@ -17,11 +17,19 @@ Row change handling:
 """
 
 import logging
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 from openpyxl.styles import PatternFill, Font, Border
 from openpyxl.utils import range_boundaries, get_column_letter
 from copy import copy
 
+# Graph helpers (pooled session, retries, timeouts), resolved once at import.
+# The module is kept (not its functions) so they are looked up at call time.
+try:
+    import function_app as graph_api
+except ImportError:
+    import function_app_local as graph_api
+
 
 # =============================================================================
 # CONFIGURATION
@@ -34,10 +42,21 @@ COMPETENCY_ORDER = {
     'Grad': 3
 }
 
+# Team sort order for the FTE table (lower = first)
+TEAM_ORDER = {
+    'Physio_North': 1,
+    'Physio_South': 2,
+    'OT': 3
+}
+
 # Grey fill for inactive therapists
 INACTIVE_FILL = PatternFill(start_color='FFC0C0C0', end_color='FFC0C0C0', fill_type='solid')
 INACTIVE_FONT = Font(color='FF808080')
 
+# Plain style for active therapists (clears any static fill / font colour)
+ACTIVE_FILL = PatternFill()
+ACTIVE_FONT = Font()
+
 # Team to sheet mapping
 TEAM_SHEET_MAP = {
     'Physio_North': 'KPI Dashboard North',
@@ -58,6 +77,10 @@ EMAIL_DAYS = [0, 3]  # Monday=0, Thursday=3
 EMAIL_HOUR_MIN = 9   # 9 AM
 EMAIL_HOUR_MAX = 12  # 11 AM
 
+# Notification emails are sent in the background so the Team Leader
+# formatting / upload carries on meanwhile; wait_for_email waits for one
+_email_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='kpi-email')
+
 
 # =============================================================================
 # EMAIL NOTIFICATION HELPERS
@@ -96,15 +119,8 @@ def send_email_graph_api(token, subject, body_html):
     Returns:
         bool: True if sent successfully
     """
-    import requests
-    
     # Graph API endpoint - send as the NOTIFICATION_EMAIL user
-    url = f"https://graph.microsoft.com/v1.0/users/{NOTIFICATION_EMAIL}/sendMail"
-    
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
+    endpoint = f"/users/{NOTIFICATION_EMAIL}/sendMail"
     
     email_data = {
         "message": {
@@ -125,7 +141,8 @@ def send_email_graph_api(token, subject, body_html):
     }
     
     try:
-        response = requests.post(url, headers=headers, json=email_data)
+        # Goes through the shared keep-alive session used for every other Graph call
+        response = graph_api.graph_request(endpoint, token, method='POST', data=email_data)
         
         if response.status_code == 202:
             logging.info(f"Email sent successfully to {NOTIFICATION_EMAIL}")
@@ -139,6 +156,28 @@ def send_email_graph_api(token, subject, body_html):
         return False
 
 
+def wait_for_email(future, timeout=None):
+    """
+    Wait for the notification email started by sync_all_team_tables.
+    
+    Args:
+        future: The 'email' future from sync_all_team_tables' stats (None = no email)
+        timeout: Seconds to wait before giving up (None = no limit)
+        
+    Returns:
+        bool: True if the email finished (or there was none), False if still sending
+    """
+    if future is None:
+        return True
+    done, not_done = wait([future], timeout=timeout)
+    if not_done:
+        logging.warning(f"Notification email still sending after {timeout}s")
+        return False
+    if future.exception() is not None:
+        logging.error(f"Error sending email: {future.exception()}")
+    return True
+
+
 def send_consolidated_email(pending_changes, token=None):
     """
     Send a single consolidated email for all row changes needed.
@@ -279,17 +318,16 @@ def get_table_rows(ws, table_name):
     min_col, min_row, max_col, max_row = range_boundaries(table.ref)
     
     rows = []
-    for row_idx in range(min_row + 1, max_row + 1):  # Skip header
-        name = ws.cell(row=row_idx, column=min_col).value
+    # One values-only scan of the body (header skipped)
+    body = ws.iter_rows(min_row=min_row + 1, max_row=max_row,
+                        min_col=min_col, max_col=max_col, values_only=True)
+    for row_idx, values in enumerate(body, start=min_row + 1):
+        name = values[0]
         if name:
-            # Get all cell values in the row
-            data = []
-            for col_idx in range(min_col, max_col + 1):
-                data.append(ws.cell(row=row_idx, column=col_idx).value)
             rows.append({
                 'row_idx': row_idx,
                 'name': str(name).strip(),
-                'data': data
+                'data': list(values)
             })
     
     return rows
@@ -303,8 +341,7 @@ def is_placeholder_row(name):
     """Check if a row name indicates it's a placeholder."""
     if not name:
         return True
-    name_upper = str(name).upper()
-    return 'PLACEHOLDER' in name_upper or name_upper.startswith('PLACEHOLDER')
+    return 'PLACEHOLDER' in str(name).upper()
 
 
 
@@ -342,7 +379,7 @@ def sync_team_tables(ws, team_name, config):
     # Get tables for this team
     table_names = TEAM_TABLES.get(team_name, [])
     new_row_count = len(therapists)
-    therapist_info = {t['Name']: t for t in therapists}
+    expected_names = {t['Name'] for t in therapists}
     
     # Check first table to determine current row count
     first_table_name = table_names[0] if table_names else None
@@ -400,7 +437,6 @@ def sync_team_tables(ws, team_name, config):
         
         # Count changes
         current_names = set(current_data.keys())
-        expected_names = {t['Name'] for t in therapists}
         placeholders = {n for n in current_names if is_placeholder_row(n)}
         
         added = len(expected_names - current_names)
@@ -413,20 +449,19 @@ def sync_team_tables(ws, team_name, config):
         # NOTE: Do NOT shrink table reference - leave rows for manual deletion
         # This preserves table structure and formatting
         
-        # Write therapist data in correct order
+        # Write therapist data in correct order - one row of cells per therapist,
+        # skipping the last column (max_col) to preserve average formulas
         first_data_row = min_row + 1
-        for i, therapist in enumerate(therapists):
-            row_idx = first_data_row + i
+        therapist_rows = ws.iter_rows(min_row=first_data_row, max_row=first_data_row + new_row_count - 1,
+                                      min_col=min_col, max_col=max_col - 1)
+        for therapist, row_cells in zip(therapists, therapist_rows):
             name = therapist['Name']
             is_active = therapist.get('IsActive', True)
             
             # Get existing data or create empty
             row_data = current_data.get(name, [name] + [None] * (col_count - 1))
             
-            # Skip last column (col_count - 1) to preserve average formulas
-            for col_offset in range(col_count - 1):
-                cell = ws.cell(row=row_idx, column=min_col + col_offset)
-                
+            for col_offset, cell in enumerate(row_cells):
                 if col_offset == 0:
                     cell.value = name
                 elif name in current_data and col_offset < len(row_data):
@@ -439,16 +474,17 @@ def sync_team_tables(ws, team_name, config):
                     cell.fill = INACTIVE_FILL
                     cell.font = INACTIVE_FONT
                 else:
-                    cell.fill = PatternFill()  # Clear any static fill
-                    cell.font = Font()  # Reset font to default
+                    cell.fill = ACTIVE_FILL  # Clear any static fill
+                    cell.font = ACTIVE_FONT  # Reset font to default
         
         # Clear VALUES only in extra rows (preserve table structure for manual deletion)
         # Skip last column (max_col) to preserve average formulas
         if row_delta < 0:
             rows_to_clear = abs(row_delta)
-            for row_idx in range(first_data_row + new_row_count, max_row + 1):
-                for col_idx in range(min_col, max_col):  # Exclude max_col (average column)
-                    cell = ws.cell(row=row_idx, column=col_idx)
+            extra_rows = ws.iter_rows(min_row=first_data_row + new_row_count, max_row=max_row,
+                                      min_col=min_col, max_col=max_col - 1)  # Exclude max_col (average column)
+            for row_cells in extra_rows:
+                for cell in row_cells:
                     cell.value = None
                     # Keep borders and table formatting intact
             rows_cleared = rows_to_clear
@@ -512,10 +548,9 @@ def sync_fte_table(wb, config):
     
     # Sort: by team, then team leaders first, then competency
     def sort_key(t):
-        team_order = {'Physio_North': 1, 'Physio_South': 2, 'OT': 3}
         is_leader = 0 if t.get('IsTeamLeader', False) else 1
         comp_order = COMPETENCY_ORDER.get(t.get('Competency', 'Grad'), 99)
-        return (team_order.get(t.get('Team', ''), 99), is_leader, comp_order, t.get('Name', ''))
+        return (TEAM_ORDER.get(t.get('Team', ''), 99), is_leader, comp_order, t.get('Name', ''))
     
     therapists.sort(key=sort_key)
     
@@ -530,25 +565,19 @@ def sync_fte_table(wb, config):
     first_data_row = min_row + 1
     
     # Write therapist data to columns A, B, C
-    for i, therapist in enumerate(therapists):
-        row_idx = first_data_row + i
-        
-        # Column A (min_col): Therapist name
-        ws.cell(row=row_idx, column=min_col).value = therapist.get('Name', '')
-        
-        # Column B (min_col + 1): FTE
-        ws.cell(row=row_idx, column=min_col + 1).value = therapist.get('FTE', 1)
-        
-        # Column C (min_col + 2): Team
-        ws.cell(row=row_idx, column=min_col + 2).value = therapist.get('Team', '')
+    fte_rows = ws.iter_rows(min_row=first_data_row, max_row=new_max_row, min_col=min_col, max_col=min_col + 2)
+    for therapist, (name_cell, fte_cell, team_cell) in zip(therapists, fte_rows):
+        name_cell.value = therapist.get('Name', '')  # Column A (min_col): Therapist name
+        fte_cell.value = therapist.get('FTE', 1)     # Column B (min_col + 1): FTE
+        team_cell.value = therapist.get('Team', '')  # Column C (min_col + 2): Team
     
     # Clear extra rows if shrinking (columns A-C only)
     rows_cleared = 0
     if row_delta < 0:
         rows_cleared = abs(row_delta)
-        for row_idx in range(new_max_row + 1, max_row + 1):
-            for col_idx in range(min_col, min_col + 3):
-                ws.cell(row=row_idx, column=col_idx).value = None
+        for row_cells in ws.iter_rows(min_row=new_max_row + 1, max_row=max_row, min_col=min_col, max_col=min_col + 2):
+            for cell in row_cells:
+                cell.value = None
     
     # Update table reference to new size
     new_ref = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{new_max_row}"
@@ -579,7 +608,9 @@ def sync_all_team_tables(wb, config, token=None):
         token: Graph API token for sending email notifications (optional)
         
     Returns:
-        dict: Overall statistics
+        dict: Overall statistics - 'email' holds the Future of the notification
+        email sent in the background (None if no email was needed); pass it
+        to wait_for_email before the run ends
     """
     logging.info("="*60)
     logging.info("Starting Team Table Sync")
@@ -589,7 +620,8 @@ def sync_all_team_tables(wb, config, token=None):
         'teams': 0,
         'tables': 0,
         'added': 0,
-        'removed': 0
+        'removed': 0,
+        'email': None
     }
     
     pending_changes = []
@@ -622,10 +654,11 @@ def sync_all_team_tables(wb, config, token=None):
                  f"+{total_stats['added']} added, -{total_stats['removed']} removed")
     logging.info("="*60)
     
-    # Send consolidated email if there are pending changes
+    # Send consolidated email if there are pending changes (in the background -
+    # the caller waits on total_stats['email'] before the run ends)
     if pending_changes:
         logging.info(f"Pending manual changes: {len(pending_changes)} team(s) affected")
-        send_consolidated_email(pending_changes, token)
+        total_stats['email'] = _email_pool.submit(send_consolidated_email, pending_changes, token)
     
     return total_stats
 
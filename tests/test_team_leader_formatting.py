@@ -0,0 +1,109 @@
+"""
+Conditional formatting anchors in the Team Leader formatter.
+
+A conditional-formatting formula's relative references resolve from the
+top-left of its sqref's bounding box, so each rule is checked against the
+sqref it is saved with, whatever order the ranges are written in.
+"""
+
+import re
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+from openpyxl import load_workbook
+from openpyxl.utils import get_column_letter
+
+import team_leader_formatting as tlf
+
+TEAM_LEADER_TEMPLATE = Path(__file__).resolve().parent.parent / 'templates' / 'Team_Leader_2026.xlsx'
+
+CELL_REF = re.compile(r'\$?([A-Z]{1,3})\$?(\d+)')
+
+BILLING_THRESHOLDS = {
+    'CA': {'green_min': 5.0, 'blue_above': 6.5},
+    'Senior': {'green_min': 5.5, 'blue_above': 7.0},
+}
+
+
+def saved_rule_refs(wb, sheet_name):
+    """
+    Save and reload the workbook, then list each formula cell reference.
+
+    Returns:
+        list: [(sqref with its ranges in string order, sqref top-left cell,
+        formula cell reference), ...]
+    """
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    ws = load_workbook(buffer)[sheet_name]
+
+    refs = []
+    for cf in ws.conditional_formatting:
+        ranges = cf.sqref.ranges
+        top_left = f"{get_column_letter(min(r.min_col for r in ranges))}{min(r.min_row for r in ranges)}"
+        for rule in cf.rules:
+            for formula in rule.formula or []:
+                for col, row in CELL_REF.findall(formula):
+                    sqref = ' '.join(sorted(str(r) for r in ranges))
+                    refs.append((sqref, top_left, f"{col}{row}"))
+    return refs
+
+
+def test_billing_rules_anchor_on_sqref_top_left():
+    # Marco (row 14) moves from CA to Senior in March, Danny (row 15) is Senior
+    # all year - the Senior sqref is 'E14:O14 C15:O15', whose top-left is C14
+    wb = load_workbook(TEAM_LEADER_TEMPLATE)
+    ws = wb['KPI Dashboard North']
+    tlf.clear_all_conditional_formatting(ws)
+    config = {
+        'thresholds': {'Physio': BILLING_THRESHOLDS},
+        'competency_history': [
+            {'Name': 'Marco', 'Competency': 'CA', 'EffectiveDate': datetime(2025, 7, 1)},
+            {'Name': 'Marco', 'Competency': 'Senior', 'EffectiveDate': datetime(2026, 3, 1)},
+        ],
+    }
+    competency_map = {'Marco': 'CA', 'Danny': 'Senior'}
+
+    tlf.format_regular_table(ws, 'Billings_North', {'kpi_type': 'billing'},
+                             tlf.SHEET_CONFIG['KPI Dashboard North'], competency_map, config,
+                             tlf.create_fills({}), year=2026)
+
+    refs = saved_rule_refs(wb, 'KPI Dashboard North')
+    assert ('C15:O15 E14:O14', 'C14', 'C14') in refs
+    for sqref, top_left, ref in refs:
+        assert ref == top_left, f"{sqref}: formula refers to {ref}, expected {top_left}"
+
+
+def test_shipped_template_rules_anchor_on_sqref_top_left():
+    # Every dashboard sheet of the shipped template, including the Average
+    # tables (B6:O11), whose rating rows share one sqref
+    wb = load_workbook(TEAM_LEADER_TEMPLATE)
+    therapists = []
+    for sheet_name, sheet_config in tlf.SHEET_CONFIG.items():
+        if sheet_config.get('is_mmp'):
+            continue
+        ws = wb[sheet_name]
+        billing_table = next(name for name, table in sheet_config['tables'].items()
+                             if table['kpi_type'] == 'billing')
+        table_info = tlf.get_table_info(ws, billing_table)
+        names = ws.iter_rows(min_row=table_info['min_row'] + 1, max_row=table_info['max_row'],
+                             min_col=table_info['min_col'], max_col=table_info['min_col'], values_only=True)
+        therapists += [{'Name': name, 'Team': sheet_config['team_name'], 'Competency': 'CA'}
+                       for (name,) in names if name]
+    config = {
+        'therapists': therapists,
+        'thresholds': {'Physio': BILLING_THRESHOLDS, 'OT': BILLING_THRESHOLDS},
+    }
+
+    for sheet_name in tlf.SHEET_CONFIG:
+        tlf.format_team_leader_sheet(wb[sheet_name], sheet_name, config, 2026)
+
+    ot_refs = saved_rule_refs(wb, 'KPI Dashboard OT')
+    assert ('C10:O10 C11:O11 C8:O8 C9:O9', 'C8', 'C8') in ot_refs
+    for sheet_name in tlf.SHEET_CONFIG:
+        refs = saved_rule_refs(wb, sheet_name)
+        assert refs
+        for sqref, top_left, ref in refs:
+            assert ref == top_left, f"{sheet_name} {sqref}: formula refers to {ref}, expected {top_left}"